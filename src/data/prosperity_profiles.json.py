@@ -0,0 +1,8 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from loader import emit
+
+emit('prosperity', 'prosperity_profiles.json', 'prosperity_profiles.json')
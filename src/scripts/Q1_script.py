@@ -1,27 +1,36 @@
 import pandas as pd
-import os
 
-master = pd.read_csv("world_bank_indicators.csv")
-
-country_meta = pd.read_csv("country_meta.csv")
-
-country_meta["iso3"] = country_meta["iso3"].str.lower()
+import countries
+import frames
+import query
+from ingest import normalize_column
+from profiling import stage
 
 col_country = "country"
 col_year    = "year"
 col_gdp_pc  = "GDP per capita (current US$)"
 col_life    = "Life expectancy at birth, total (years)"
 
-q1 = master[[col_country, col_year, col_gdp_pc, col_life]].copy()
+q1_cols = [col_country, col_year, col_gdp_pc, col_life]
+# Only these columns, and rows from 1990 on, are read from the file
+q1 = query.scan("world_bank_indicators.csv").select(*[normalize_column(c) for c in q1_cols]).years(1990)
+q1 = q1.collect()
+q1.columns = q1_cols
 
-q1 = q1[q1[col_year] >= 1990].dropna(subset=[col_gdp_pc, col_life], how="all")
+q1 = q1.dropna(subset=[col_gdp_pc, col_life], how="all")
 
-q1 = q1.merge(country_meta, left_on="country", right_on="iso3", how="inner")
+# Keep countries in the metadata and attach its columns by integer key
+keys = countries.keys(q1[col_country])
+known = keys != countries.UNKNOWN
+q1 = pd.concat([
+    q1[known].reset_index(drop=True),
+    countries.lookup(keys[known], ["iso3", "country_name", "region", "income_group"])
+], axis=1)
 
 q1 = q1.sort_values(["country", "year"]).reset_index(drop=True)
 
-os.makedirs("clean", exist_ok=True)
-out_path = "clean/gdp_lifeexpectancy.csv"
-q1.to_csv(out_path, index=False)
+out_path = "clean/gdp_lifeexpectancy.feather"
+with stage('write', rows_in=len(q1)):
+    frames.write(q1, out_path)
 
 print(f"Saved cleaned file to: {out_path}")
@@ -1,9 +1,13 @@
 import pandas as pd
 
-gdp = pd.read_csv("clean/gdp_lifeexpectancy.csv")
-edu = pd.read_csv("education.csv")
+import countries
+import frames
+from ingest import normalize_column, read_columns, read_header
+from panel import bucket, latest, quantile_tiers
+from profiling import stage
 
-gdp['iso3'] = gdp['iso3'].str.upper()
+gdp = frames.read("clean/gdp_lifeexpectancy.feather")
+edu_header = read_header("education.csv")
 
 col_iso     = "iso3"
 col_country = "country_name"
@@ -12,63 +16,58 @@ col_gdp     = "GDP per capita (current US$)"
 col_life    = "Life expectancy at birth, total (years)"
 col_group   = "income_group"
 col_lit     = "Literacy rate, adult total (% of people ages 15 and above)"
-iso_col_edu = "Country Code" if "Country Code" in edu.columns else "country"
-
-edu_latest = (
-    edu.dropna(subset=[col_lit])
-       .sort_values(col_year)
-       .groupby(iso_col_edu)
-       .tail(1)
-       .rename(columns={iso_col_edu: col_iso})
-       [[col_iso, col_lit]]
-)
+iso_col_edu = "country code" if "country code" in edu_header else "country"
 
-gdp_latest = (
-    gdp.dropna(subset=[col_gdp, col_life])
-       .sort_values(col_year)
-       .groupby(col_iso)
-       .tail(1)
-       [[col_iso, col_country, col_year, col_gdp, col_life, col_group]]
-)
+# ingest parses entries such as '85.2%' to numbers
+edu = read_columns("education.csv", [col_year, iso_col_edu, normalize_column(col_lit)], edu_header)
+edu = edu.rename(columns={normalize_column(col_lit): col_lit})
 
-merged = pd.merge(gdp_latest, edu_latest, on=col_iso, how="inner")
+# Both sides are joined on the integer country key
+col_key = "key"
+gdp[col_key] = countries.keys(gdp[col_iso])
+edu[col_key] = countries.keys(edu[iso_col_edu])
 
-merged[col_lit] = (
-    merged[col_lit]
-    .astype(str)
-    .str.strip()
-    .str.extract(r"([\d\.]+)", expand=False)
-    .str.strip()
-    .astype(float)
+edu_latest = latest(edu, [col_lit], by=col_key, time=col_year)[[col_key, col_lit]]
+
+# Dropping incomplete rows first keeps GDP and life expectancy from the same year
+gdp_latest = (
+    latest(gdp.dropna(subset=[col_gdp, col_life]), [col_country, col_gdp, col_life, col_group],
+           by=col_key, time=col_year)
+       [[col_key, col_country, col_year, col_gdp, col_life, col_group]]
 )
 
+merged = pd.merge(gdp_latest, edu_latest, on=col_key, how="inner")
+merged.insert(0, col_iso, countries.iso3(merged.pop(col_key)))
+
 merged = merged.dropna(subset=[col_lit])
 
 bucket_bins = [0, 60, 80, 90, 100]
 bucket_labels = ["<60%", "60-80%", "80-90%", "90-100%"]
+tier_labels = ["Low GDP", "Lower-Mid GDP", "Upper-Mid GDP", "High GDP"]
 
-merged["literacy_bucket"] = pd.cut(
-    merged[col_lit],
-    bins=bucket_bins,
-    labels=bucket_labels,
-    include_lowest=True,
-    right=True
-)
+merged["literacy_bucket"] = bucket(merged[col_lit], bucket_bins, bucket_labels)
+merged["gdp_tier"] = quantile_tiers(merged[col_gdp], tier_labels)
 
-merged["literacy_bucket"] = merged["literacy_bucket"].astype("category")
-merged["literacy_bucket"] = merged["literacy_bucket"].cat.set_categories(
-    bucket_labels, ordered=True
-)
 
-merged["gdp_tier"] = pd.qcut(
-    merged["GDP per capita (current US$)"],
-    q=4,
-    labels=["Low GDP", "Lower-Mid GDP", "Upper-Mid GDP", "High GDP"]
-)
+out_path = "clean/q2_gdp_life_literacy.feather"
+with stage('write', rows_in=len(merged)):
+    frames.write(merged, out_path)
 
+# Every country-year with GDP and literacy, tiered within its year
+with stage('panel', rows_in=len(gdp) + len(edu)) as s:
+    panel = gdp.dropna(subset=[col_gdp])[[col_key, col_country, col_year, col_gdp, col_life, col_group]].merge(
+        edu[[col_key, col_year, col_lit]], on=[col_key, col_year], how="inner"
+    )
+    panel.insert(0, col_iso, countries.iso3(panel.pop(col_key)))
+    panel = panel.dropna(subset=[col_lit])
+    panel["literacy_bucket"] = bucket(panel[col_lit], bucket_bins, bucket_labels)
+    panel["gdp_tier"] = quantile_tiers(panel[col_gdp], tier_labels, by=panel[col_year])
+    s.rows_out = len(panel)
 
-out_path = "clean/q2_gdp_life_literacy.csv"
-merged.to_csv(out_path, index=False)
+panel_path = "clean/q2_panel.feather"
+with stage('write', rows_in=len(panel)):
+    frames.write(panel, panel_path)
 
 print(f"Saved cleaned Q2 dataset to: {out_path}")
 print(f"Countries included: {merged.shape[0]}")
+print(f"Saved {len(panel)} country-years to: {panel_path}")
@@ -1,43 +1,49 @@
-import pandas as pd
-
-BASE_FILE = "clean/q2_gdp_life_literacy.csv"
+import countries
+import frames
+from ingest import normalize_column, read_columns
+from panel import asof_join
+from profiling import stage
+import validate
+
+BASE_FILE = "clean/q2_gdp_life_literacy.feather"
 POVERTY_FILE = "poverty.csv"
-OUTPUT_FILE = "clean/q3_poverty_filled.csv"
+OUTPUT_FILE = "clean/q3_poverty_filled.feather"
 
 POV_COL = "Poverty headcount ratio at $6.85 a day (2017 PPP) (% of population)"
 
-df = pd.read_csv(BASE_FILE)
-poverty = pd.read_csv(POVERTY_FILE)
+# Oldest poverty observation (in years) allowed to fill a row; None means no limit
+MAX_POVERTY_AGE = None
 
-poverty = poverty[["country", "year", POV_COL]].copy()
-poverty["country"] = poverty["country"].str.upper()
-df["iso3"] = df["iso3"].str.upper()
+# Least share of rows that must get a poverty value
+MIN_POVERTY_COVERAGE = 0.5
 
-# Acknowledgment: we used external sources to help with this data wrangling
+report = validate.Report()
 
-#  Pivot poverty data into wide format (country to year columns)
-poverty_wide = poverty.pivot(index="country", columns="year", values=POV_COL)
+df = frames.read(BASE_FILE)
+poverty = read_columns(POVERTY_FILE, ["country", "year", normalize_column(POV_COL)])
+poverty.columns = ["country", "year", POV_COL]
 
-# Perform backward fill (use most recent prior value)
-poverty_filled = poverty_wide.sort_index(axis=1, ascending=False).bfill(axis=1)
+report.check(poverty, validate.topic_schema([POV_COL]), POVERTY_FILE)
+poverty = poverty.rename(columns={POV_COL: "poverty_rate_6_85"})
 
-# Melt back to long format
-poverty_long = poverty_filled.reset_index().melt(
-    id_vars="country",
-    var_name="year",
-    value_name="poverty_rate_6_85"
-)
+# Join on the integer country key rather than the codes
+df["key"] = countries.keys(df["iso3"])
+poverty["key"] = countries.keys(poverty.pop("country"))
 
-poverty_long["year"] = poverty_long["year"].astype(int)
+# Use the most recent poverty value at or before each year,
+# ignoring values older than MAX_POVERTY_AGE years
+merged = asof_join(df, poverty, left_by="key", right_by="key", tolerance=MAX_POVERTY_AGE).drop(columns="key")
 
-merged = df.merge(
-    poverty_long,
-    left_on=["iso3", "year"],
-    right_on=["country", "year"],
-    how="left"
-).drop(columns=["country"])
+report.check(merged, {
+    'keys': ['iso3', 'year'],
+    'countries': 'iso3',
+    'ranges': {'poverty_rate_6_85': validate.PERCENT},
+    'coverage': {'poverty_rate_6_85': MIN_POVERTY_COVERAGE}
+}, OUTPUT_FILE)
+report.finish()
 
-merged.to_csv(OUTPUT_FILE, index=False)
+with stage('write', rows_in=len(merged)):
+    frames.write(merged, OUTPUT_FILE)
 
 print(f"Merge complete with time-fill. Saved as {OUTPUT_FILE}")
 print("Missing poverty values:", merged['poverty_rate_6_85'].isna().sum())
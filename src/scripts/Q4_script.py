@@ -1,27 +1,46 @@
-import pandas as pd
+import countries
+import frames
+from ingest import normalize_column, read_columns
+from profiling import stage
+import validate
 
-BASE = "clean/q3_poverty_filled.csv"
+BASE = "clean/q3_poverty_filled.feather"
 ENV = "environment.csv"
-OUT = "clean/q4_env_merged.csv"
+OUT = "clean/q4_env_merged.feather"
 
 ENV_COL = "Carbon intensity of GDP (kg CO2e per 2021 PPP $ of GDP)"
 
-base = pd.read_csv(BASE)
-env = pd.read_csv(ENV)
+# Least share of rows that must get a carbon intensity value
+MIN_ENV_COVERAGE = 0.5
 
-env['iso3'] = env['country'].str.upper()
+report = validate.Report()
 
-env = env[['iso3', 'year', ENV_COL]]
+base = frames.read(BASE)
+env = read_columns(ENV, ["country", "year", normalize_column(ENV_COL)])
+env.columns = ["country", "year", ENV_COL]
+
+report.check(env, validate.topic_schema([ENV_COL]), ENV)
 
 print(f"Base rows: {len(base)}, Env rows: {len(env)}")
 print("Unique iso3 in base:", base['iso3'].nunique())
-print("Unique iso3 in env :", env['iso3'].nunique())
+print("Unique iso3 in env :", env['country'].nunique())
+
+# Join on the integer country key rather than the codes
+base['key'] = countries.keys(base['iso3'])
+env['key'] = countries.keys(env['country'])
+env = env[['key', 'year', ENV_COL]]
 
-merged = base.merge(env, on=['iso3', 'year'], how='left')
+with stage('merge', rows_in=len(base) + len(env)) as s:
+    merged = base.merge(env, on=['key', 'year'], how='left').drop(columns='key')
+    s.rows_out = len(merged)
 
 print("Rows after merge:", len(merged))
 missing = merged[ENV_COL].isna().sum()
 print(f"Missing carbon intensity values: {missing} / {len(merged)}")
 
-merged.to_csv(OUT, index=False)
+report.check(merged, {'keys': ['iso3', 'year'], 'coverage': {ENV_COL: MIN_ENV_COVERAGE}}, OUT)
+report.finish()
+
+with stage('write', rows_in=len(merged)):
+    frames.write(merged, OUT)
 print(f"Saved merged file to {OUT}")
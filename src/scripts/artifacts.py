@@ -0,0 +1,177 @@
+"""
+Writers for the compact data files the site pages load.
+Every artifact is published through a temp file: when the new content
+hashes the same as the file already there, the old file is kept untouched
+(so its mtime, the framework's build cache and CDN validators stay valid).
+Each directory keeps a manifest (artifacts.json) with the SHA-256, size and
+row count of the artifacts published into it. Set ARTIFACT_ENCODINGS to
+e.g. "gzip,br" to also keep pre-compressed .gz/.br copies next to each
+artifact (br requires the brotli package).
+"""
+
+import contextlib
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from profiling import profiled
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_FILE = 'artifacts.json'
+ENCODINGS = [e for e in os.environ.get('ARTIFACT_ENCODINGS', '').split(',') if e]
+
+SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='w'):
+    """
+    Open a temp file next to path for writing; it replaces path when the
+    block completes and is removed if the block raises, so readers never
+    see a partly written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+# (path, mtime, size) -> SHA-256, so an unchanged file is hashed once per process
+_digests = {}
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def digest(path):
+    """SHA-256 of the file at path, hashed again only once its mtime or size changes."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _digests:
+        _digests[key] = _sha256(path)
+    return _digests[key]
+
+
+def _compress(path, encoding):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if encoding == 'gzip':
+        # mtime=0 keeps the output identical for identical input
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == 'br':
+        if brotli is None:
+            raise ImportError("ARTIFACT_ENCODINGS=br requires the brotli package")
+        return brotli.compress(data)
+    raise ValueError(f"Unknown artifact encoding: {encoding}")
+
+
+def _write_variants(path, changed):
+    """Pre-compressed copies of path; only rewritten when path changed or one is missing."""
+    sizes = {}
+    for encoding in ENCODINGS:
+        variant = path + SUFFIXES.get(encoding, '.' + encoding)
+        if changed or not os.path.exists(variant):
+            with atomic_write(variant, 'wb') as f:
+                f.write(_compress(path, encoding))
+        sizes[encoding] = os.path.getsize(variant)
+    return sizes
+
+
+@contextlib.contextmanager
+def _locked(directory):
+    # Stages running side by side publish into the same directory
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _record(path, entry):
+    """Store entry for path in its directory's manifest, if it differs."""
+    directory = os.path.dirname(path) or '.'
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    with _locked(directory):
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        name = os.path.basename(path)
+        if manifest.get(name) == entry:
+            return
+        manifest[name] = entry
+        with atomic_write(manifest_path) as f:
+            json.dump(dict(sorted(manifest.items())), f, indent=2)
+
+
+def publish(path, write, rows=None, encodings=True):
+    """
+    Publish the file write(tmp_path) produces at path, unless path already
+    holds the same bytes. Records the artifact in the directory's manifest
+    and, with encodings, refreshes its compressed copies. Returns True when
+    path changed.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        # Hashed directly: both files may have just been written
+        sha256 = _sha256(tmp_path)
+        changed = not os.path.exists(path) or _sha256(path) != sha256
+        if changed:
+            os.replace(tmp_path, path)
+    finally:
+        # Unchanged content, or write() raised
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+
+    entry = {'sha256': sha256, 'bytes': os.path.getsize(path), 'rows': rows}
+    if encodings and ENCODINGS:
+        entry['encodings'] = _write_variants(path, changed)
+    _record(path, entry)
+    return changed
+
+
+def to_csv(df, path):
+    """Publish df as CSV without the index."""
+    return publish(path, lambda tmp_path: df.to_csv(tmp_path, index=False), rows=len(df))
+
+
+@profiled('write')
+def to_column_json(df, path, decimals=4):
+    """
+    Publish df as column-packed JSON ({column: [values...]}).
+    Floats are rounded to decimals and missing values become null.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_float_dtype(values):
+            values = values.astype('float64').round(decimals)
+        values = values.astype(object).where(values.notna(), None)
+        columns[col] = [v.item() if hasattr(v, 'item') else v for v in values]
+
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(columns, f, separators=(',', ':'))
+
+    return publish(path, write, rows=len(df))
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the data preparation scripts on synthetic World Bank-shaped
+data. The generator writes topic CSVs with the raw headers the scripts
+select (padded with filler indicators to the width of the real files),
+country/year keys from 1960 to 2024 and realistic sparsity. Scale 1 has
+about as many countries as the World Bank data; scale N splits each country
+into N subnational units. Every pipeline stage and both KMeans scripts run
+at each scale. Their CPU time (including worker processes) and peak RSS
+are compared with the stored baseline; wall time is reported too, but it
+swings with machine load, so it does not decide regressions. Scripts run
+without profiling, whose tracemalloc tracing would dominate the timings,
+unless --profile asks for its stage records.
+
+Usage:
+    python benchmark.py [--scales 1 10 100] [--repeat N] [--save-baseline] [--profile]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+import pipeline
+from profiling import rss_mb
+
+BENCH_DIR = os.environ.get('BENCHMARK_DIR', '.benchmarks')
+BASELINE_FILE = os.path.join(pipeline.SCRIPTS_DIR, 'benchmark_baseline.json')
+
+BASE_COUNTRIES = 217
+YEARS = range(1960, 2025)
+
+# Sub-second scripts are mostly interpreter start-up and imports; CPU time
+# differences smaller than this are noise, whatever their ratio
+MIN_SLOWDOWN_S = 0.25
+
+# Fewer runs per script than this only report regressions: a single sample
+# of a sub-second script can be a quarter slower on a busy machine
+MIN_REPEAT = 3
+
+# Recorded in synthetic.json with the scale and seed; a data set written
+# under another spec is generated again
+GENERATOR_VERSION = 3
+
+# Indicators the scripts select, in the raw casing of the World Bank files
+TOPIC_INDICATORS = {
+    'agriculture_rural_development.csv': [
+        'Rural population (% of total population)',
+        'Access to electricity, rural (% of rural population)'
+    ],
+    'aid_effectiveness.csv': [],
+    'climate_change.csv': [
+        'Population growth (annual %)',
+        'Energy use (kg of oil equivalent) per $1,000 GDP (constant 2021 PPP)'
+    ],
+    'economy_growth.csv': [
+        'GDP per capita (current US$)',
+        'GDP (current US$)'
+    ],
+    'education.csv': [
+        'Literacy rate, adult total (% of people ages 15 and above)',
+        'Primary completion rate, total (% of relevant age group)',
+        'School enrollment, secondary (% gross)'
+    ],
+    'environment.csv': [
+        'Renewable energy consumption (% of total final energy consumption)',
+        'PM2.5 air pollution, mean annual exposure (micrograms per cubic meter)',
+        'Total greenhouse gas emissions excluding LULUCF per capita (t CO2e/capita)',
+        'Carbon intensity of GDP (kg CO2e per 2021 PPP $ of GDP)'
+    ],
+    'external_debt.csv': [],
+    'financial_sector.csv': [
+        'Inflation, consumer prices (annual %)',
+        'Domestic credit to private sector (% of GDP)'
+    ],
+    'infrastructure.csv': [
+        'Individuals using the internet (% of population)',
+        'Mobile cellular subscriptions (per 100 people)',
+        'Electric power consumption (kWh per capita)',
+        'Access to electricity (% of population)'
+    ],
+    'poverty.csv': [
+        'Poverty headcount ratio at $6.85 a day (2017 PPP) (% of population)'
+    ],
+    'private_sector.csv': []
+}
+
+# Indicator columns in each real topic file
+TOPIC_WIDTHS = {
+    'agriculture_rural_development.csv': 23,
+    'aid_effectiveness.csv': 20,
+    'climate_change.csv': 4,
+    'economy_growth.csv': 30,
+    'education.csv': 52,
+    'environment.csv': 30,
+    'external_debt.csv': 20,
+    'financial_sector.csv': 31,
+    'infrastructure.csv': 25,
+    'poverty.csv': 6,
+    'private_sector.csv': 20
+}
+
+REGIONS = [
+    'Europe & Central Asia', 'Sub-Saharan Africa', 'Latin America & Caribbean',
+    'East Asia & Pacific', 'Middle East, North Africa, Afghanistan & Pakistan',
+    'South Asia', 'North America'
+]
+INCOME_GROUPS = ['High income', 'Upper middle income', 'Lower middle income', 'Low income']
+
+
+def country_codes(scale):
+    """ISO3-like codes; above scale 1 every country has scale subnational units."""
+    codes = [''.join(c) for c in product(string.ascii_uppercase, repeat=3)][:BASE_COUNTRIES]
+    if scale == 1:
+        return codes
+    return [f"{code}-{unit:03d}" for code in codes for unit in range(scale)]
+
+
+def topic_values(rng, indicators, n_countries):
+    """
+    Per-column generators of one year's values: a level per country, a
+    yearly drift and noise. Percentages stay within 0-100 and other values
+    non-negative, so the data passes validate.py's checks. Coverage varies
+    by indicator and country and rises over time, like the real files; the
+    indicators the scripts select are filled like the well-covered real
+    ones, above validate.COVERAGE.
+    """
+    n = len(indicators)
+    percent = np.array(['%' in name for name in indicators])
+    selected = np.array([not name.startswith('Synthetic indicator') for name in indicators])
+    level = np.where(
+        percent,
+        rng.uniform(5, 95, (n_countries, n)),
+        rng.lognormal(rng.uniform(0, 9, n), 1.0, (n_countries, n))
+    )
+    drift = rng.normal(0, 0.01, (n_countries, n))
+    coverage = rng.uniform(np.where(selected, 0.7, 0.2), 0.95) * (rng.random((n_countries, n)) > 0.1)
+
+    def year_values(year):
+        t = year - YEARS[0]
+        values = level * (1 + drift * t) * rng.normal(1, 0.03, level.shape)
+        values = np.where(percent, np.clip(values, 0, 100), np.maximum(values, 0))
+        observed = rng.random(level.shape) < coverage * min(1.0, 0.3 + t / 40)
+        return np.where(observed, values, np.nan)
+
+    return year_values
+
+
+def write_topic(path, rng, countries, indicators):
+    year_values = topic_values(rng, indicators, len(countries))
+    with open(path, 'w') as f:
+        for i, year in enumerate(YEARS):
+            frame = pd.DataFrame(year_values(year), columns=indicators)
+            frame.insert(0, 'country', countries)
+            frame.insert(0, 'year', year)
+            frame.to_csv(f, header=i == 0, index=False, float_format='%.6g')
+
+
+def generate(data_dir, scale, seed=0):
+    """Write the synthetic raw data for scale into data_dir (reused if already there)."""
+    marker = os.path.join(data_dir, 'synthetic.json')
+    spec = {'scale': scale, 'seed': seed, 'years': [YEARS[0], YEARS[-1]], 'version': GENERATOR_VERSION}
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == spec:
+                return
+    shutil.rmtree(data_dir, ignore_errors=True)
+    os.makedirs(data_dir)
+
+    rng = np.random.default_rng(seed)
+    countries = country_codes(scale)
+
+    meta = pd.DataFrame({
+        'iso3': [code.lower() for code in countries],
+        'country_name': [f"Country {code}" for code in countries],
+        'region': rng.choice(REGIONS, len(countries)),
+        'income_group': rng.choice(INCOME_GROUPS, len(countries))
+    })
+    meta.to_csv(os.path.join(data_dir, 'country_meta.csv'), index=False)
+
+    for file_name, indicators in TOPIC_INDICATORS.items():
+        filler = [f"Synthetic indicator {i} (% of total)" if i % 2 else f"Synthetic indicator {i}"
+                  for i in range(TOPIC_WIDTHS[file_name] - len(indicators))]
+        write_topic(os.path.join(data_dir, file_name), rng, countries, indicators + filler)
+
+    # Q1 reads the GDP/life expectancy extract with lowercase codes from 1990 on
+    indicators = ['GDP per capita (current US$)', 'Life expectancy at birth, total (years)']
+    year_values = topic_values(rng, indicators, len(countries))
+    with open(os.path.join(data_dir, 'world_bank_indicators.csv'), 'w') as f:
+        for year in YEARS:
+            values = year_values(year)
+            if year < 1990:
+                continue
+            frame = pd.DataFrame(values, columns=indicators)
+            frame.insert(0, 'year', year)
+            frame.insert(0, 'country', meta['iso3'])
+            frame.to_csv(f, header=year == 1990, index=False, float_format='%.6g')
+
+    with open(marker, 'w') as f:
+        json.dump(spec, f)
+
+
+def measure(command, cwd, env):
+    """Run command; returns (returncode, wall seconds, CPU seconds, peak RSS in MB, stderr)."""
+    with tempfile.TemporaryFile() as err:
+        start = time.perf_counter()
+        proc = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=err)
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        err.seek(0)
+        stderr = err.read().decode(errors='replace')
+
+    return proc.returncode, wall, usage.ru_utime + usage.ru_stime, rss_mb(usage.ru_maxrss), stderr
+
+
+def benchmarks(scale_dir):
+    """(name, command, cwd, setup) for every benchmarked script, in run order."""
+    data_dir = os.path.join(scale_dir, 'data')
+    work_dir = os.path.join(scale_dir, 'work')
+
+    def script(name):
+        return [sys.executable, os.path.join(pipeline.SCRIPTS_DIR, name)]
+
+    def stage_outputs_for_clusters():
+        # cluster_socioeconomic.py reads its inputs from ../data
+        os.makedirs(os.path.join(data_dir, 'snapshots'), exist_ok=True)
+        shutil.copy(os.path.join(data_dir, 'socioeconomic_profiles.csv'),
+                    os.path.join(data_dir, 'socioeconomic_profiles@1.csv'))
+        shutil.copy(os.path.join(data_dir, 'prosperity_sustainability.csv'),
+                    os.path.join(data_dir, 'snapshots', 'prosperity_sustainability.csv'))
+
+    def fresh_model():
+        model = os.path.join(data_dir, 'prosperity_kmeans.json')
+        if os.path.exists(model):
+            os.remove(model)
+
+    order = pipeline.topological_order(list(pipeline.STAGES), pipeline.upstream(pipeline.STAGES))
+    runs = [
+        (name, pipeline.stage_command(pipeline.STAGES[name]), data_dir, fresh_model if name == 'clusters' else None)
+        for name in order
+    ]
+    runs.append(('cluster_socioeconomic', script('cluster_socioeconomic.py'), work_dir,
+                 stage_outputs_for_clusters))
+    return runs
+
+
+def run_scale(scale, repeat=1, warm=False, seed=0, only=None, profile=False, bench_dir=BENCH_DIR):
+    """
+    Fastest wall/CPU time and median peak RSS of each script at scale. With
+    profile, the scripts also append their stage records to stages.jsonl in
+    the scale's directory.
+    """
+    scale_dir = os.path.abspath(os.path.join(bench_dir, f"scale-{scale}"))
+    print(f"[Processing] Generating synthetic data at scale {scale}...")
+    generate(os.path.join(scale_dir, 'data'), scale, seed)
+    os.makedirs(os.path.join(scale_dir, 'work'), exist_ok=True)
+
+    results = {}
+    for name, command, cwd, setup in benchmarks(scale_dir):
+        samples = []
+        for _ in range(repeat):
+            env = dict(os.environ)
+            env.pop('PIPELINE_PROFILE', None)
+            if profile:
+                env['PIPELINE_PROFILE'] = os.path.join(scale_dir, 'stages.jsonl')
+            if not warm:
+                # Every sample parses the topic files from scratch
+                env['TOPIC_CACHE_DIR'] = tempfile.mkdtemp(prefix='topic-cache-')
+            if setup:
+                setup()
+            returncode, wall, cpu, rss, stderr = measure(command, cwd, env)
+            if not warm:
+                shutil.rmtree(env['TOPIC_CACHE_DIR'], ignore_errors=True)
+            if returncode != 0:
+                sys.exit(f"[ERROR] {name} failed at scale {scale}:\n{stderr}")
+            samples.append((wall, cpu, rss))
+
+        if only and name not in only:
+            continue
+        # Machine load only ever adds time, so the fastest sample is the steadiest
+        wall, cpu = np.min(samples, axis=0)[:2]
+        rss = np.median(samples, axis=0)[2]
+        results[name] = {'wall_s': round(wall, 3), 'cpu_s': round(cpu, 3), 'peak_rss_mb': round(rss, 1)}
+        print(f"    {name}: {wall:.2f}s wall, {cpu:.2f}s CPU, {rss:.0f} MB")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Table of results against the baseline; regressed rows exceed its CPU
+    time (by more than MIN_SLOWDOWN_S as well) or RSS by more than tolerance.
+    """
+    rows = []
+    for scale, scripts in results.items():
+        for name, current in scripts.items():
+            base = baseline.get('results', {}).get(scale, {}).get(name)
+            row = {'scale': scale, 'script': name, **current}
+            if base:
+                row['cpu_ratio'] = current['cpu_s'] / base['cpu_s'] if base['cpu_s'] else np.nan
+                row['rss_ratio'] = current['peak_rss_mb'] / base['peak_rss_mb']
+                slower = (row['cpu_ratio'] > 1 + tolerance
+                          and current['cpu_s'] - base['cpu_s'] > MIN_SLOWDOWN_S)
+                row['regressed'] = slower or row['rss_ratio'] > 1 + tolerance
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100],
+                        help="data scales to run (default: 1 10 100)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per script; the fastest is kept (default: 3)")
+    parser.add_argument('--only', nargs='+', default=None, metavar='SCRIPT',
+                        help="report only these benchmarks (the others still run to produce their inputs)")
+    parser.add_argument('--warm', action='store_true', help="keep the parsed-topic cache between runs")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic data (default: 0)")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline results to compare with")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed CPU time or memory growth over the baseline (default: 0.25)")
+    parser.add_argument('--profile', action='store_true',
+                        help="have the scripts write profiling stage records (slows them; not compared as a failure)")
+    args = parser.parse_args()
+    if args.save_baseline and (args.profile or args.repeat < MIN_REPEAT):
+        parser.error(f"--save-baseline needs --repeat {MIN_REPEAT} or more and no --profile")
+
+    results = {
+        str(scale): run_scale(scale, repeat=args.repeat, warm=args.warm, seed=args.seed, only=args.only,
+                              profile=args.profile)
+        for scale in args.scales
+    }
+
+    if args.save_baseline:
+        baseline = {
+            'machine': f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'repeat': args.repeat,
+            'warm': args.warm,
+            'results': results
+        }
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\n[SUCCESS] Saved baseline to '{args.baseline}'")
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        print(f"[Warning] No baseline at {args.baseline}; nothing to compare with.")
+
+    report = compare(results, baseline, args.tolerance)
+    print()
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+    if 'regressed' in report and report['regressed'].fillna(False).any():
+        if args.profile or args.repeat < MIN_REPEAT:
+            print(f"\n[Warning] Regressions beyond {args.tolerance:.0%} of the baseline, not counted as a "
+                  f"failure: --profile slows the scripts, and fewer than {MIN_REPEAT} repeats are too noisy")
+            return
+        print(f"\n[FAILED] Regressions beyond {args.tolerance:.0%} of the baseline "
+              f"({baseline.get('machine', 'unknown machine')})")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
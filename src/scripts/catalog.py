@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Persisted index of the indicators in the topic CSVs.
+For every file it records the raw header, whether the year/country keys are
+present, and for each normalized indicator name its column position, the
+first and last year with data and its non-null density. Entries are keyed
+by the file's content hash, so a file is only scanned again after it
+changes; the merge scripts resolve their indicators here before reading any
+data. A scan reads the file in blocks of rows, from the parsed-topic cache
+when it holds the file and from the CSV otherwise; scripts that go on to
+read whole files ask for new files to be parsed into the cache first, so
+they are parsed once rather than once per scan and once per read.
+
+    python catalog.py [pattern ...]    # list topic indicators matching all patterns
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+import topic_cache
+from artifacts import atomic_write, digest
+from ingest import BASE_COLS, iter_columns, normalize_column, parse_topic, read_header
+
+CATALOG_FILE = os.path.join(topic_cache.CACHE_DIR, 'indicator_catalog.json')
+
+# Stored in the catalog file; a catalog of another version is dropped and
+# every topic file scanned again
+CATALOG_VERSION = 2
+
+
+# Rows per block when scanning a file, so a scan never holds a whole topic file
+SCAN_ROWS = 25_000
+
+
+def _blocks(file_name, header, columns, cache=False):
+    """
+    columns of file_name in frames of up to SCAN_ROWS rows, sliced from its
+    cached table when it has been parsed already (or, with cache, once it
+    has been parsed into the cache), else read from the CSV.
+    """
+    table = topic_cache.cached(file_name, columns, parse_topic if cache else None)
+    if table is None:
+        yield from iter_columns(file_name, columns, header, chunksize=SCAN_ROWS)
+        return
+    for batch in table.to_batches(max_chunksize=SCAN_ROWS):
+        yield batch.to_pandas()
+
+
+def scan(file_name, cache=False):
+    """Catalog entry of one topic file; cache as in load."""
+    header = read_header(file_name)
+    positions = {normalize_column(col): i for i, col in enumerate(header.values())}
+    entry = {
+        'digest': digest(file_name),
+        'header': header,
+        'has_keys': all(col in header for col in BASE_COLS),
+        'indicators': {}
+    }
+
+    values = [col for col in header if col not in BASE_COLS and col != 'country code']
+    columns = (['year'] if entry['has_keys'] else []) + values
+    rows = 0
+    counts = np.zeros(len(values), dtype='int64')
+    first = np.full(len(values), np.inf)
+    last = np.full(len(values), -np.inf)
+    for block in (_blocks(file_name, header, columns, cache) if columns else []):
+        observed = block[values].notna().to_numpy()
+        rows += len(block)
+        counts += observed.sum(axis=0)
+        if entry['has_keys']:
+            years = np.where(observed, block['year'].to_numpy(dtype='float64')[:, None], np.nan)
+            first = np.fmin(first, np.nanmin(years, axis=0, initial=np.inf))
+            last = np.fmax(last, np.nanmax(years, axis=0, initial=-np.inf))
+    entry['rows'] = rows
+
+    for i, col in enumerate(values):
+        entry['indicators'][col] = {
+            'column': header[col],
+            'position': positions[col],
+            'first_year': int(first[i]) if np.isfinite(first[i]) else None,
+            'last_year': int(last[i]) if np.isfinite(last[i]) else None,
+            'density': round(float(counts[i]) / rows, 4) if rows else 0.0
+        }
+    return entry
+
+
+def load(files, path=CATALOG_FILE, cache=False):
+    """
+    Catalog entries of the files that exist, scanning only new or changed
+    files. Returns {file name: entry}. With cache, a file scanned is parsed
+    into the topic cache first, for callers about to read it whole; streamed
+    merges leave it off so no scan holds a whole file.
+    """
+    catalog = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            stored = json.load(f)
+        if stored.get('version') == CATALOG_VERSION:
+            catalog = stored['files']
+
+    entries, changed = {}, False
+    for file_name in files:
+        if not os.path.exists(file_name):
+            continue
+        entry = catalog.get(file_name)
+        if entry is None or entry['digest'] != digest(file_name):
+            entry = catalog[file_name] = scan(file_name, cache)
+            changed = True
+        entries[file_name] = entry
+
+    if changed:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with atomic_write(path) as f:
+            json.dump({'version': CATALOG_VERSION, 'files': catalog}, f)
+    return entries
+
+
+def plan(entries, sources):
+    """
+    Resolve {file: [indicators]} against the catalog without reading data.
+    Returns (selected, skipped): selected maps each usable file to its
+    found and missing indicators, skipped maps other files to the reason.
+    """
+    selected, skipped = {}, {}
+    for file_name, indicators in sources.items():
+        entry = entries.get(file_name)
+        if entry is None:
+            skipped[file_name] = 'file not found'
+        elif not entry['has_keys']:
+            skipped[file_name] = "'year' or 'country' column not found"
+        else:
+            found = [ind for ind in indicators if ind in entry['indicators']]
+            missing = [ind for ind in indicators if ind not in entry['indicators']]
+            if found:
+                selected[file_name] = (found, missing)
+            else:
+                skipped[file_name] = 'none of the indicators found'
+    return selected, skipped
+
+
+def search(entries, *patterns):
+    """(file, indicator, info) for every indicator containing all patterns."""
+    patterns = [normalize_column(p) for p in patterns]
+    return [
+        (file_name, name, info)
+        for file_name, entry in entries.items()
+        for name, info in entry['indicators'].items()
+        if all(p in name for p in patterns)
+    ]
+
+
+if __name__ == '__main__':
+    from pipeline import TOPIC_FILES
+    for file_name, name, info in search(load(TOPIC_FILES), *sys.argv[1:]):
+        years = f"{info['first_year']}-{info['last_year']}" if info['first_year'] else 'no data'
+        print(f"{file_name}  [{info['position']}] {name}  ({years}, {info['density']:.0%} filled)")
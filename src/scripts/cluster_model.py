@@ -0,0 +1,113 @@
+"""
+Saved KMeans model (scaler + centroids) for assigning clusters without refitting.
+The model is stored as plain JSON (feature list, scaler statistics and
+centroids in scaled units) and the estimators are rebuilt on load, so a
+saved model does not depend on the sklearn/numpy versions that wrote it.
+A refit is relabelled to match the previous model's centroids so cluster IDs
+stay stable across runs, and a saved model can absorb new rows with
+MiniBatchKMeans partial_fit updates.
+"""
+
+import json
+import os
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+
+from artifacts import atomic_write
+
+
+def save(path, scaler, kmeans, features):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    model = {
+        'features': list(features),
+        'mean': scaler.mean_.tolist(),
+        'var': scaler.var_.tolist(),
+        'scale': scaler.scale_.tolist(),
+        'samples': int(scaler.n_samples_seen_),
+        'dtype': str(kmeans.cluster_centers_.dtype),
+        'centroids': kmeans.cluster_centers_.tolist()
+    }
+    with atomic_write(path) as f:
+        json.dump(model, f, indent=2)
+
+
+def load(path):
+    """The saved model as {'scaler', 'kmeans', 'features'}, with fitted estimators."""
+    with open(path) as f:
+        saved = json.load(f)
+
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(saved['mean'])
+    scaler.var_ = np.asarray(saved['var'])
+    scaler.scale_ = np.asarray(saved['scale'])
+    scaler.n_features_in_ = len(saved['features'])
+    scaler.n_samples_seen_ = saved['samples']
+
+    # A fit on the centroids themselves gives a fitted estimator with one
+    # centroid per cluster; the saved values are then restored exactly, as
+    # the fit recenters the data and can move them by rounding
+    centers = np.asarray(saved['centroids'], dtype=saved['dtype'])
+    kmeans = KMeans(n_clusters=len(centers), init=centers, n_init=1, max_iter=1).fit(centers)
+    kmeans.cluster_centers_ = centers
+    return {'scaler': scaler, 'kmeans': kmeans, 'features': saved['features']}
+
+
+def predict(model, X):
+    """Cluster labels for raw (unscaled) feature rows."""
+    kmeans = model['kmeans']
+    # A model fitted on the float32 feature store needs float32 rows
+    return kmeans.predict(model['scaler'].transform(X).astype(kmeans.cluster_centers_.dtype, copy=False))
+
+
+def centroids(model):
+    """Centroids in raw feature units, comparable across scalers."""
+    return model['scaler'].inverse_transform(model['kmeans'].cluster_centers_)
+
+
+def align_labels(previous, scaler, kmeans):
+    """
+    Reorder a fresh fit's clusters to best match a previous model's centroids.
+    Returns new_id, where new_id[label] is the stable ID of fitted label.
+    Clusters with no counterpart (when k grew) take the next unused IDs.
+    """
+    reference = (centroids(previous) - scaler.mean_) / scaler.scale_
+    fitted = kmeans.cluster_centers_
+    cost = ((fitted[:, None, :] - reference[None, :, :]) ** 2).sum(axis=2)
+    rows, cols = linear_sum_assignment(cost)
+
+    new_id = np.full(len(fitted), -1)
+    new_id[rows] = cols
+    unmatched = np.flatnonzero(new_id < 0)
+    new_id[unmatched] = np.arange(len(reference), len(reference) + len(unmatched))
+
+    # Dense IDs when k shrank: keep the matched order, close the gaps
+    new_id = np.argsort(np.argsort(new_id))
+    return new_id
+
+
+def relabel(kmeans, new_id):
+    """Apply align_labels' mapping to a fitted KMeans in place."""
+    order = np.argsort(new_id)
+    kmeans.cluster_centers_ = kmeans.cluster_centers_[order]
+    kmeans.labels_ = new_id[kmeans.labels_]
+    return kmeans
+
+
+def update(model, X, random_state=42):
+    """
+    Move the saved centroids towards new raw feature rows with a
+    MiniBatchKMeans partial_fit step. Cluster IDs are unchanged.
+    """
+    kmeans = model['kmeans']
+    if not isinstance(kmeans, MiniBatchKMeans):
+        kmeans = MiniBatchKMeans(
+            n_clusters=len(kmeans.cluster_centers_),
+            init=kmeans.cluster_centers_,
+            n_init=1,
+            random_state=random_state
+        )
+    kmeans.partial_fit(model['scaler'].transform(X))
+    return {**model, 'kmeans': kmeans}
@@ -4,24 +4,74 @@ K-Means Clustering using prosperity_sustainability.csv
 This file already has ISO3 country codes which the map needs
 """
 
+import argparse
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
 
-print("="*60)
-print("K-Means Clustering for Country Socioeconomic Profiles")
-print("="*60)
+import cluster_model
+import feature_store
+import neighbors
+import trajectories
+from artifacts import to_column_json, to_csv
+from kmeans_sweep import feature_subsets, sweep
+from profiling import stage
 
-print("\n[1/5] Loading data...")
-df = pd.read_csv('../data/prosperity_sustainability.csv')
+parser = argparse.ArgumentParser(description="K-Means clustering of country prosperity profiles")
+parser.add_argument('--k', type=int, default=4, help="number of clusters (default: 4)")
+parser.add_argument('--sweep', action='store_true',
+                    help="report inertia/silhouette over a range of k and seeds instead of saving clusters")
+parser.add_argument('--k-range', type=int, nargs=2, default=[2, 8], metavar=('MIN', 'MAX'),
+                    help="k values to sweep, inclusive (default: 2 8)")
+parser.add_argument('--seeds', type=int, nargs='+', default=[42], help="random seeds to sweep (default: 42)")
+parser.add_argument('--subsets', action='store_true', help="also sweep every subset of 2+ features")
+parser.add_argument('--jobs', type=int, default=None, help="worker processes for the sweep (default: CPU count)")
+parser.add_argument('--input', default=None,
+                    help="country-year feature file (default: ../data/snapshots/prosperity_sustainability.csv; "
+                         "required with --panel)")
+parser.add_argument('--years', type=int, nargs='+', default=[2024], help="years to cluster (default: 2024)")
+parser.add_argument('--model', default='../data/prosperity_kmeans.json',
+                    help="saved scaler and centroids; refits keep its cluster IDs")
+parser.add_argument('--predict', action='store_true', help="assign rows to the saved model's clusters without refitting")
+parser.add_argument('--update', action='store_true',
+                    help="with --predict, first move the saved centroids towards the rows (MiniBatchKMeans partial_fit)")
+parser.add_argument('--output', default=None,
+                    help="output CSV (default: ../data/snapshots/country_clusters.csv, or country_clusters_by_year.csv for several years)")
+parser.add_argument('--neighbors', default=None,
+                    help="similar-countries JSON (default: ../data/country_neighbors.json, "
+                         "or country_neighbors_by_year.json for several years)")
+parser.add_argument('--neighbors-k', type=int, default=5, help="neighbours per country (default: 5)")
+parser.add_argument('--panel', action='store_true',
+                    help="cluster every country-year since --since and each country's trajectory instead of one cross-section")
+parser.add_argument('--since', type=int, default=2010, help="first year of the panel (default: 2010)")
+parser.add_argument('--min-years', type=int, default=5,
+                    help="years a country needs in the panel to get a trajectory cluster (default: 5)")
+parser.add_argument('--trajectories', default='../data/country_trajectories.json',
+                    help="panel mode output (default: ../data/country_trajectories.json)")
+args = parser.parse_args()
+if args.panel and not args.input:
+    # The panel has no snapshot; the pipeline's prosperity stage writes it
+    parser.error("--panel needs --input, e.g. the prosperity_sustainability_panel.csv "
+                 "written by pipeline.py in the raw data directory")
 
-df_latest = df[df['year'] == 2024].copy()
+input_file = args.input or '../data/snapshots/prosperity_sustainability.csv'
+if not os.path.exists(input_file):
+    sys.exit(f"[ERROR] Input file not found: {input_file}")
 
-print(f"Total countries in 2024: {len(df_latest)}")
-print(f"Sample countries: {', '.join(df_latest['country'].head(10).values)}")
+output_file = args.output or (
+    '../data/snapshots/country_clusters.csv' if len(args.years) == 1 else '../data/country_clusters_by_year.csv'
+)
+neighbors_file = args.neighbors or (
+    '../data/country_neighbors.json' if len(args.years) == 1 else '../data/country_neighbors_by_year.json'
+)
+
+print("="*60)
+print("K-Means Clustering for Country Socioeconomic Profiles")
+print("="*60)
 
-print("\n[2/5] Preparing features...")
 features = [
     'gdp per capita (current us$)',
     'renewable energy consumption (% of total final energy consumption)',
@@ -29,20 +79,127 @@ features = [
     'inflation, consumer prices (annual %)'
 ]
 
-df_clean = df_latest[['country'] + features].dropna()
+if args.panel:
+    print(f"\n[Panel] Loading country-years since {args.since} from {input_file}...")
+    store = feature_store.load(
+        input_file,
+        features,
+        select=lambda df: df[df['year'] >= args.since],
+        key=f"since={args.since}"
+    )
+    keys = pd.DataFrame(store.meta['keys'])
+    X_scaled = store.select()
+    countries, years, T = trajectories.tensor(keys['country'], keys['year'], X_scaled)
+    print(f"Panel: {len(countries)} countries x {len(years)} years x {len(features)} features, "
+          f"{len(X_scaled)} complete country-years")
+
+    k = args.k
+    print(f"\n[Panel] Fitting k={k} clusters over all country-years (MiniBatchKMeans)...")
+    with stage('fit', rows_in=len(X_scaled)):
+        kmeans = trajectories.fit(X_scaled, k)
+    if os.path.exists(args.model):
+        previous = cluster_model.load(args.model)
+        if previous['features'] == features:
+            print(f"Aligning cluster IDs with the saved model in {args.model}...")
+            cluster_model.relabel(kmeans, cluster_model.align_labels(previous, store.scaler(), kmeans))
+    yearly = trajectories.yearly_labels(kmeans, T)
+
+    print(f"\n[Panel] Clustering trajectories of countries with {args.min_years}+ years...")
+    with stage('fit', rows_in=len(countries)):
+        paths, _ = trajectories.trajectory_labels(T, k, min_years=args.min_years)
+    print(f"Countries with a trajectory cluster: {(paths >= 0).sum()} of {len(countries)}")
 
+    counts = trajectories.transitions(yearly, k)
+    moves = counts.sum() - np.trace(counts)
+    print(f"\nYear-to-year cluster moves: {moves} of {counts.sum()} transitions")
+    print(pd.DataFrame(counts, index=[f"from {i}" for i in range(k)], columns=[f"to {i}" for i in range(k)]))
+
+    rows, cols = np.nonzero(yearly >= 0)
+    output = pd.DataFrame({
+        'country': countries[rows],
+        'year': years[cols],
+        'cluster': yearly[rows, cols],
+        'trajectory': pd.array(paths[rows], dtype='Int64')
+    })
+    output.loc[output['trajectory'] < 0, 'trajectory'] = pd.NA
+    with stage('write', rows_in=len(output)):
+        to_column_json(output, args.trajectories)
+    print(f"\n✓ Saved {len(output)} country-year labels to {args.trajectories}")
+    sys.exit(0)
+
+print("\n[1/5] Loading data...")
+# Selected, cleaned and standardized once per version of the input
+store = feature_store.load(
+    input_file,
+    features,
+    select=lambda df: df[df['year'].isin(args.years)],
+    key=f"years={sorted(args.years)}"
+)
+
+print(f"Total country-years in {', '.join(map(str, args.years))}: {store.meta['rows_selected']}")
+
+print("\n[2/5] Preparing features...")
+df_clean = store.frame()
+
+print(f"Sample countries: {', '.join(df_clean['country'].head(10).values)}")
 print(f"Countries with complete data: {len(df_clean)}")
-print(f"Countries dropped due to missing data: {len(df_latest) - len(df_clean)}")
+print(f"Countries dropped due to missing data: {store.meta['rows_selected'] - len(df_clean)}")
+if df_clean.empty:
+    sys.exit(f"[ERROR] No complete rows for {', '.join(map(str, args.years))} in {input_file}")
+
+if args.predict:
+    if not os.path.exists(args.model):
+        sys.exit(f"[ERROR] No saved model at {args.model}; run without --predict to fit one")
+    print(f"\n[3/5] Loading saved model from {args.model}...")
+    model = cluster_model.load(args.model)
+    if model['features'] != features:
+        sys.exit(f"[ERROR] Saved model was fitted on different features: {model['features']}")
+    if args.update:
+        print("Updating centroids with the selected rows (partial_fit)...")
+        model = cluster_model.update(model, df_clean[features])
+        cluster_model.save(args.model, model['scaler'], model['kmeans'], features)
+    k = len(model['kmeans'].cluster_centers_)
+    print(f"\n[4/5] Assigning rows to the saved {k} clusters...")
+    df_clean['cluster'] = cluster_model.predict(model, df_clean[features])
+else:
+    scaler = store.scaler()
+    X_scaled = store.select()
+
+    if args.sweep:
+        print(f"\n[Sweep] Fitting k={args.k_range[0]}..{args.k_range[1]}, seeds={args.seeds}...")
+        results = sweep(
+            X_scaled,
+            features,
+            ks=range(args.k_range[0], args.k_range[1] + 1),
+            seeds=args.seeds,
+            subsets=feature_subsets(features) if args.subsets else None,
+            jobs=args.jobs
+        )
+        report = pd.DataFrame(results)
+        report['features'] = report['features'].apply(lambda subset: ','.join(str(features.index(f)) for f in subset))
+        for i, feat in enumerate(features):
+            print(f"  feature {i}: {feat}")
+        report = report.sort_values(['silhouette', 'inertia'], ascending=[False, True])
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+        sys.exit(0)
 
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(df_clean[features])
-print("\n[4/5] Performing K-Means clustering (k=4)...")
-kmeans = KMeans(n_clusters=4, random_state=42, n_init=10)
-df_clean['cluster'] = kmeans.fit_predict(X_scaled)
+    k = args.k
+    print(f"\n[4/5] Performing K-Means clustering (k={k})...")
+    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
+    with stage('fit', rows_in=len(X_scaled)):
+        kmeans.fit(X_scaled)
 
-print(f"Clustering complete. Inertia: {kmeans.inertia_:.2f}")
+    if os.path.exists(args.model):
+        previous = cluster_model.load(args.model)
+        if previous['features'] == features:
+            print(f"Aligning cluster IDs with the saved model in {args.model}...")
+            cluster_model.relabel(kmeans, cluster_model.align_labels(previous, scaler, kmeans))
+    cluster_model.save(args.model, scaler, kmeans, features)
 
-for i in range(4):
+    df_clean['cluster'] = kmeans.labels_
+    print(f"Clustering complete. Inertia: {kmeans.inertia_:.2f}")
+
+for i in range(k):
     cluster_data = df_clean[df_clean['cluster'] == i]
     print(f"\n{'='*60}")
     print(f"Cluster {i}: {len(cluster_data)} countries")
@@ -52,8 +209,7 @@ for i in range(4):
         print(f"  {feat}: {cluster_data[feat].mean():.2f}")
     print(f"\nSample countries: {', '.join(cluster_data['country'].head(10).values)}")
 
-output = df_clean[['country', 'cluster'] + features].copy()
-output['year'] = 2024
+output = df_clean[['country', 'cluster'] + features + ['year']].copy()
 
 output = output.rename(columns={
     'gdp per capita (current us$)': 'gdp',
@@ -62,10 +218,23 @@ output = output.rename(columns={
     'inflation, consumer prices (annual %)': 'inflation'
 })
 
-output.to_csv('../data/country_clusters.csv', index=False)
+with stage('write', rows_in=len(output)):
+    to_csv(output, output_file)
+
+print(f"\nBuilding PCA projection and {args.neighbors_k}-nearest-neighbor index...")
+X_scaled = store.select()
+coords, pca = neighbors.project(X_scaled)
+positions, distances = neighbors.nearest(X_scaled, k=args.neighbors_k, groups=df_clean['year'])
+similar = neighbors.table(df_clean[['country', 'year', 'cluster']], positions, distances)
+similar['pc1'] = coords[:, 0]
+similar['pc2'] = coords[:, 1]
+with stage('write', rows_in=len(similar)):
+    to_column_json(similar, neighbors_file)
+print(f"PCA explained variance: {', '.join(f'{v:.1%}' for v in pca.explained_variance_ratio_)}")
+print(f"✓ Saved nearest neighbors of {len(similar)} country-years to {neighbors_file}")
 
 print(f"\n{'='*60}")
-print(f"✓ Saved {len(output)} countries to ../data/country_clusters.csv")
+print(f"✓ Saved {len(output)} rows to {output_file}")
 print(f"{'='*60}")
 print("\nCluster distribution:")
 print(output['cluster'].value_counts().sort_index())
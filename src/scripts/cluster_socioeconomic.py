@@ -1,14 +1,17 @@
 import pandas as pd
 import numpy as np
 from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
 
-df = pd.read_csv('../data/socioeconomic_profiles@1.csv')
+import feature_store
+from artifacts import to_csv
+from panel import latest
+from profiling import stage
+
+source = '../data/socioeconomic_profiles@1.csv'
 country_meta = pd.read_csv('../data/country_meta.csv')
 
-print("Socioeconomic columns:", df.columns.tolist()[:5])
+print("Socioeconomic columns:", pd.read_csv(source, nrows=0).columns.tolist()[:5])
 print("Meta columns:", country_meta.columns.tolist())
-df_latest = df.sort_values('year').groupby('country').tail(1)
 
 features = [
     'gdp per capita (current us$)',
@@ -18,16 +21,18 @@ features = [
     'electric power consumption (kwh per capita)'
 ]
 
-df_clean = df_latest[['country'] + features].dropna()
+# max_age=0 keeps only values from each country's latest year; the snapshot
+# is cleaned and standardized once per version of the source
+store = feature_store.load(source, features, select=lambda df: latest(df, features, max_age=0), key='latest')
+df_clean = store.frame()
+X_scaled = store.select()
 
 print(f"Countries with complete data: {len(df_clean)}")
-print(f"Countries dropped: {len(df_latest) - len(df_clean)}")
-
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(df_clean[features])
+print(f"Countries dropped: {store.meta['rows_selected'] - len(df_clean)}")
 
 kmeans = KMeans(n_clusters=4, random_state=42, n_init=10)
-df_clean['cluster'] = kmeans.fit_predict(X_scaled)
+with stage('fit', rows_in=len(df_clean)):
+    df_clean['cluster'] = kmeans.fit_predict(X_scaled)
 
 print("\nCluster Summary:")
 for i in range(4):
@@ -36,7 +41,7 @@ for i in range(4):
     print(cluster_data[features].mean())
     print(f"Sample countries: {', '.join(cluster_data['country'].astype(str).head(5).values)}")
 
-prosperity_df = pd.read_csv('../data/prosperity_sustainability.csv')
+prosperity_df = pd.read_csv('../data/snapshots/prosperity_sustainability.csv')
 
 print("\nProsperity file sample:")
 print(prosperity_df[['country', 'year']].head())
@@ -50,8 +55,9 @@ print(df_clean['country'].head(20))
 output['country'] = output['country'].astype(str)
 output['year'] = 2024
 
-output.to_csv('../data/country_clusters.csv', index=False)
+with stage('write', rows_in=len(output)):
+    to_csv(output, '../data/snapshots/country_clusters.csv')
 
-print(f"\nSaved {len(output)} countries to ../data/country_clusters.csv")
+print(f"\nSaved {len(output)} countries to ../data/snapshots/country_clusters.csv")
 print("\nFirst few rows:")
 print(output.head(10))
@@ -1,5 +1,10 @@
-import pandas as pd
-import os
+import catalog
+import artifacts
+from ingest import BASE_COLS
+from profiling import stage
+import query
+import stream
+import validate
 
 # All the csvs and indicators to merge
 indicators_to_merge = {
@@ -34,70 +39,62 @@ indicators_to_merge = {
     ]
 }
 
-base_cols = ['year', 'country']
-merged_df = None
+base_cols = BASE_COLS
+scans = []
+selected = {}
+report = validate.Report()
 
 print("--- Starting Merge for Socio-Economic Profile Data (Q3) ---")
 
+# Resolving indicators from the catalog before reading any data (parsing
+# new files into the topic cache on the way, unless streaming)
+entries = catalog.load(indicators_to_merge, cache=not stream.PARTITIONS)
+planned, skipped = catalog.plan(entries, indicators_to_merge)
+for file_name, reason in skipped.items():
+    print(f"[Warning] Skipping {file_name}: {reason}.")
+
 # Merging files
 
-for file_name, indicators in indicators_to_merge.items():
-    if not os.path.exists(file_name):
-        print(f"[Warning] File not found: {file_name}. Skipping.")
-        continue
-        
+for file_name, (found, missing) in planned.items():
     try:
         print(f"[Processing] Loading file: {file_name}")
-        df = pd.read_csv(file_name)
-        df.columns = [col.strip().lower() for col in df.columns]
-        if 'year' not in df.columns or 'country' not in df.columns:
-            print(f"[Warning] Skipping {file_name}: 'year' or 'country' column not found.")
-            continue
-        cols_to_select = base_cols.copy()
-        for ind in indicators:
-            if ind in df.columns:
-                cols_to_select.append(ind)
-            else:
-                print(f"[Warning] Indicator not found in {file_name}: {ind}")
+        header = entries[file_name]['header']
+        for ind in missing:
+            print(f"[Warning] Indicator not found in {file_name}: {ind}")
+        cols_to_select = base_cols + found
         
-        subset_df = df[cols_to_select].drop_duplicates(subset=base_cols)
-        
-        if merged_df is None:
-            merged_df = subset_df
-            print(f"    ...Initialized merge with {file_name}")
+        if stream.PARTITIONS:
+            selected[file_name] = (header, cols_to_select)
         else:
-            merged_df = pd.merge(merged_df, subset_df, on=base_cols, how='outer')
-            print(f"    ...Merged data from {file_name}")
+            scans.append(
+                query.scan(file_name, header).select(*cols_to_select)
+                     .validate(validate.topic_schema(found), report)
+            )
+        print(f"    ...Selected {len(cols_to_select) - len(base_cols)} indicators from {file_name}")
             
     except Exception as e:
         print(f"[ERROR] Failed to process {file_name}: {e}")
 
-# Cleaning data
-if merged_df is not None:
-    print("\n--- Finalizing Data (Creating Most Recent Snapshot) ---")
-    
-    merged_df = merged_df[merged_df['year'] >= 2010].copy()
-    
-    merged_df = merged_df.sort_values(by=['country', 'year'])
+print("\n--- Finalizing Data (Creating Most Recent Snapshot) ---")
+print("Selecting most recent non-missing value of each indicator per country...")
+if stream.PARTITIONS:
+    print(f"Streaming the join in {stream.PARTITIONS} country partitions...")
+    final_df = stream.snapshot(selected, min_year=2010, report=report)
+elif scans:
+    # Joining all subsets on (country, year) at once; the year filter and
+    # column selections are applied while each file is read
+    panel = query.join(*scans).years(2010)
+    final_df = stream.snapshot(panel.collect())
+    print("Query plan:")
+    print(panel.explain())
+else:
+    final_df = None
 
-    print("Forward-filling missing data within each country...")
-    merged_df = merged_df.groupby('country').ffill()
-    
-    print("Resetting index...")
-    merged_df = merged_df.reset_index()
-    
-    # renaming country column
-    if 'country' not in merged_df.columns:
-        print("[INFO] 'country' column not found, renaming 'index' column.")
-        if 'index' in merged_df.columns:
-            merged_df = merged_df.rename(columns={'index': 'country'})
-        else:
-            print("[ERROR] Catastrophic error: Neither 'country' nor 'index' found after reset.")
-            
+# Stop here, before writing anything, if the data failed its checks
+report.finish()
 
-    print("Selecting most recent snapshot for each country...")
-    final_df = merged_df.drop_duplicates(subset=['country'], keep='last')
-    
+# Cleaning data
+if final_df is not None:
     print("Dropping rows with any remaining missing data...")
     original_count = final_df.shape[0]
     final_df = final_df.dropna()
@@ -106,7 +103,8 @@ if merged_df is not None:
 
     # Save into CSV
     output_file = "socioeconomic_profiles.csv"
-    final_df.to_csv(output_file, index=False)
+    with stage('write', rows_in=len(final_df)):
+        artifacts.to_csv(final_df, output_file)
     
     print(f"\n[SUCCESS] Successfully created '{output_file}'")
     print(f"Final data shape: {final_df.shape}")
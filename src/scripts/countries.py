@@ -0,0 +1,72 @@
+"""
+Canonical integer keys for countries, shared by the scripts.
+The lookup table is built once per process from country_meta.csv (written
+by fetch_countries_script.py): each ISO3 code gets a compact int16 key, its
+position in the sorted list of upper-case codes, and the country's name,
+region and income group are kept next to it as categoricals. Codes match
+whatever their case, and only the distinct codes of a column are looked up
+(a categorical column is never expanded), so scripts join on the integer
+keys instead of upper/lower-casing and string-merging whole columns, and
+turn keys back into codes or names only for output.
+"""
+
+import numpy as np
+import pandas as pd
+
+META_FILE = 'country_meta.csv'
+KEY_DTYPE = 'int16'
+
+# Key of codes missing from the metadata (e.g. World Bank aggregates)
+UNKNOWN = -1
+
+_tables = {}
+
+
+def table(path=META_FILE):
+    """
+    The lookup table, indexed by key: iso3 as written in the metadata,
+    the upper-case code and the metadata's other columns as categoricals.
+    """
+    if path not in _tables:
+        meta = pd.read_csv(path)
+        meta['code'] = meta['iso3'].str.upper()
+        meta = meta.sort_values('code', ignore_index=True)
+        for col in meta.columns:
+            if col not in ('iso3', 'code'):
+                meta[col] = meta[col].astype('category')
+        _tables[path] = meta
+    return _tables[path]
+
+
+def keys(codes, path=META_FILE):
+    """Key of each ISO3 code in codes (any case), UNKNOWN where there is none."""
+    codes = pd.Series(codes).reset_index(drop=True)
+    if not isinstance(codes.dtype, pd.CategoricalDtype):
+        codes = codes.astype('category')
+    known = pd.Index(table(path)['code'])
+    category_keys = known.get_indexer(codes.cat.categories.astype(str).str.upper())
+    positions = codes.cat.codes.to_numpy()
+    return np.where(positions >= 0, category_keys[positions], UNKNOWN).astype(KEY_DTYPE)
+
+
+def lookup(country_keys, columns, path=META_FILE):
+    """Metadata columns of each (known) key, as a frame in key order given."""
+    return table(path)[list(columns)].take(np.asarray(country_keys)).reset_index(drop=True)
+
+
+def iso3(country_keys, path=META_FILE):
+    """Upper-case ISO3 code of each (known) key."""
+    return table(path)['code'].to_numpy()[np.asarray(country_keys)]
+
+
+def map_codes(codes, mapping, path=META_FILE):
+    """
+    mapping ({ISO3 code: value}) applied to codes through their keys;
+    codes not in the mapping or the metadata get NaN.
+    """
+    country_keys = keys(codes, path)
+    values = np.full(len(table(path)) + 1, np.nan, dtype=object)
+    # The extra last slot is where UNKNOWN (-1) keys land
+    values[keys(list(mapping), path)] = list(mapping.values())
+    values[-1] = np.nan
+    return values[country_keys]
@@ -0,0 +1,123 @@
+"""
+Country x feature matrices for the clustering scripts, built once per data
+version. A build reads the source CSV, applies the caller's row selection,
+drops rows missing any feature and standardizes the columns. The
+standardized matrix is saved as a contiguous float32 .npy file, and the raw
+values (float64, so written outputs keep the source precision) next to it,
+with a JSON sidecar holding the row keys (country, year), feature names and
+scaling statistics. Consumers memory-map the files, so later runs (and
+worker processes) skip loading, cleaning and scaling altogether.
+Builds are keyed by the source's content hash, the features and the
+caller's selection key.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+import topic_cache
+from artifacts import atomic_write, digest
+
+STORE_DIR = os.path.join(topic_cache.CACHE_DIR, 'features')
+
+# Hashed into each build's name along with the source digest, features and
+# selection key, so builds in an older .npy/.json layout are never opened
+STORE_VERSION = 1
+
+KEY_COLS = ['country', 'year']
+
+
+class FeatureMatrix:
+    def __init__(self, base):
+        with open(base + '.json') as f:
+            self.meta = json.load(f)
+        self.features = self.meta['features']
+        self.raw = np.load(base + '.raw.npy', mmap_mode='r')
+        self.scaled = np.load(base + '.scaled.npy', mmap_mode='r')
+
+    def __len__(self):
+        return len(self.raw)
+
+    def columns(self, names):
+        return [self.features.index(name) for name in names]
+
+    def select(self, names=None, scaled=True):
+        """Columns by name; the full matrix (still memory-mapped) when names is None."""
+        X = self.scaled if scaled else self.raw
+        return X if names is None else X[:, self.columns(names)]
+
+    def frame(self, names=None):
+        """Row keys and raw feature values as a DataFrame."""
+        names = names or self.features
+        df = pd.DataFrame(self.meta['keys'])
+        for name, col in zip(names, self.columns(names)):
+            df[name] = self.raw[:, col]
+        return df
+
+    def scaler(self, names=None):
+        """A StandardScaler carrying the stored statistics, for saving with a model."""
+        cols = self.columns(names or self.features)
+        scaler = StandardScaler()
+        scaler.mean_ = np.asarray(self.meta['mean'])[cols]
+        scaler.var_ = np.asarray(self.meta['var'])[cols]
+        scaler.scale_ = np.asarray(self.meta['scale'])[cols]
+        scaler.n_features_in_ = len(cols)
+        scaler.n_samples_seen_ = len(self)
+        return scaler
+
+
+def _save(path, array, dtype):
+    with atomic_write(path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array, dtype=dtype))
+
+
+def build(source, features, base, select=None):
+    df = pd.read_csv(source)
+    if select is not None:
+        df = select(df)
+    rows_selected = len(df)
+    df = df.dropna(subset=features)
+
+    values = df[features].to_numpy(dtype='float64')
+    mean = values.mean(axis=0)
+    var = values.var(axis=0)
+    # Constant columns are left centred, as StandardScaler does
+    scale = np.where(var == 0, 1.0, np.sqrt(var))
+
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    _save(base + '.raw.npy', values, 'float64')
+    _save(base + '.scaled.npy', (values - mean) / scale, 'float32')
+
+    keys = {col: df[col].tolist() for col in KEY_COLS if col in df.columns}
+    meta = {
+        'source': source,
+        'features': list(features),
+        'rows_selected': rows_selected,
+        'keys': keys,
+        'mean': mean.tolist(),
+        'var': var.tolist(),
+        'scale': scale.tolist()
+    }
+    # The sidecar is written last; a build without one is incomplete
+    with atomic_write(base + '.json') as f:
+        json.dump(meta, f)
+
+
+def load(source, features, select=None, key=''):
+    """
+    The feature matrix of source, building it if this data version has not
+    been built yet. select(df) picks the rows to use (e.g. one year);
+    key must identify the selection, since functions are not hashed.
+    """
+    params = [digest(source), list(features), key, STORE_VERSION]
+    name = hashlib.sha256(json.dumps(params).encode()).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(source))[0]
+    base = os.path.join(STORE_DIR, f"{stem}-{name}")
+
+    if not os.path.exists(base + '.json'):
+        build(source, features, base, select)
+    return FeatureMatrix(base)
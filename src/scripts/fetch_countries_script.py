@@ -1,13 +1,11 @@
-import requests
+import asyncio
+
 import pandas as pd
-import os
 
-url = "https://api.worldbank.org/v2/country?format=json&per_page=300"
-resp = requests.get(url)
-resp.raise_for_status()
-data = resp.json()
+from worldbank import Fetcher, fetch_countries
 
-country_list = data[1]
+with Fetcher() as fetcher:
+    country_list = asyncio.run(fetch_countries(fetcher))
 
 records = []
 for c in country_list:
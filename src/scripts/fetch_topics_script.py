@@ -0,0 +1,30 @@
+import argparse
+import asyncio
+import time
+
+from worldbank import TOPICS, Fetcher, fetch_topic
+
+parser = argparse.ArgumentParser(description="Refresh the World Bank topic CSVs in the current directory")
+parser.add_argument('files', nargs='*', help=f"topic files to refresh (default: all of {', '.join(TOPICS)})")
+parser.add_argument('--date', default='1960:2024', help="year range to request (default: 1960:2024)")
+parser.add_argument('--concurrency', type=int, default=8, help="requests in flight at once (default: 8)")
+args = parser.parse_args()
+
+files = args.files or list(TOPICS)
+unknown = [f for f in files if f not in TOPICS]
+if unknown:
+    parser.error(f"unknown topic files: {', '.join(unknown)}")
+
+
+async def refresh(fetcher):
+    # All topics (and all of their indicator pages) are fetched concurrently
+    tables = await asyncio.gather(*(fetch_topic(fetcher, TOPICS[f], date=args.date) for f in files))
+    for file_name, df in zip(files, tables):
+        df.to_csv(file_name, index=False)
+        print(f"[SUCCESS] Saved {file_name}: {df.shape[0]} rows, {df.shape[1] - 2} indicators")
+
+
+start = time.perf_counter()
+with Fetcher(concurrency=args.concurrency) as fetcher:
+    asyncio.run(refresh(fetcher))
+print(f"Refreshed {len(files)} topic files in {time.perf_counter() - start:.1f}s")
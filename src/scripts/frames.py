@@ -0,0 +1,54 @@
+"""
+Typed interchange files between the Q stages.
+Intermediate tables are written as uncompressed Feather (pyarrow), so the
+next stage gets them back with their types: indicators stay float32, years
+int16, and repeated strings (country names, regions, income groups, bucket
+labels) are stored once per file as categorical dictionaries. CSV is only
+rendered when a table is published (see loader.py).
+
+    python frames.py clean/q4_env_merged.feather > q4.csv
+"""
+
+import sys
+
+import pandas as pd
+
+from artifacts import publish
+
+# String columns with at most this share of distinct values become categorical
+CATEGORY_RATIO = 0.5
+
+
+def compact(df):
+    """df with float32 indicators and categorical repeated strings."""
+    dtypes = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_float_dtype(values) and values.dtype != 'float32':
+            dtypes[col] = 'float32'
+        elif (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)) \
+                and not isinstance(values.dtype, pd.CategoricalDtype) \
+                and values.nunique() <= CATEGORY_RATIO * len(values):
+            dtypes[col] = 'category'
+    return df.astype(dtypes)
+
+
+def write(df, path):
+    """Publish df (compacted) at path; an unchanged table leaves the file untouched."""
+    table = compact(df).reset_index(drop=True)
+    return publish(path, table.to_feather, rows=len(table), encodings=False)
+
+
+def read(path, columns=None):
+    return pd.read_feather(path, columns=columns)
+
+
+def to_csv(path, out):
+    """Render the table at path as the published CSV."""
+    read(path).to_csv(out, index=False)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+    to_csv(sys.argv[1], sys.stdout)
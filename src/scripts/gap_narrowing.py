@@ -1,6 +1,17 @@
-import pandas as pd
+import contextlib
 import os
 
+import pandas as pd
+
+import catalog
+import countries
+from ingest import BASE_COLS
+from artifacts import publish, to_column_json, to_csv
+from profiling import stage
+import query
+import stream
+import validate
+
 # Cleaning colum names
 indicators_to_merge = {
     'education.csv': [
@@ -22,67 +33,143 @@ indicators_to_merge = {
     ]
 }
 
-base_cols = ['year', 'country']
-merged_df = None
+# Country groups compared on the q6 page
+country_groups = {
+    **{iso: 'High-Income' for iso in ['USA', 'DEU', 'JPN', 'GBR', 'CAN', 'FRA', 'AUS', 'NOR', 'SWE']},
+    **{iso: 'Developing' for iso in ['BRA', 'RUS', 'IND', 'CHN', 'ZAF',
+                                      'NGA', 'PAK', 'BGD', 'MEX', 'IDN', 'ETH', 'EGY']}
+}
+gap_metrics = [
+    'primary completion rate, total (% of relevant age group)',
+    'poverty headcount ratio at $6.85 a day (2017 ppp) (% of population)'
+]
+
+base_cols = BASE_COLS
+scans = []
+selected = {}
+report = validate.Report()
 
 print("--- Starting Time-Series Merge for Education/Health Gap Analysis ---")
 
-for file_name, indicators in indicators_to_merge.items():
-    
-    if not os.path.exists(file_name):
-        print(f"[Warning] File not found: {file_name}. Skipping.")
-        continue
-        
+# Resolve files and indicators from the catalog before reading any data
+# (parsing new files into the topic cache on the way, unless streaming)
+entries = catalog.load(indicators_to_merge, cache=not stream.PARTITIONS)
+planned, skipped = catalog.plan(entries, indicators_to_merge)
+for file_name, reason in skipped.items():
+    print(f"[Warning] Skipping {file_name}: {reason}.")
+
+for file_name, (found, missing) in planned.items():
     try:
         print(f"[Processing] Loading file: {file_name}")
-        df = pd.read_csv(file_name)
-        
-        # Clean and standardize column names 
-        df.columns = [col.strip().lower() for col in df.columns]
-        
-        # Check if the file has the base columns
-        if 'year' not in df.columns or 'country' not in df.columns:
-            print(f"[Warning] Skipping {file_name}: 'year' or 'country' column not found.")
-            continue
-            
+
+        # Normalized header from the catalog
+        header = entries[file_name]['header']
+
         # Build list of indicators
-        cols_to_select = base_cols.copy()
-        for ind in indicators:
-            if ind in df.columns:
-                cols_to_select.append(ind)
-            else:
-                print(f"[Warning] Indicator not found in {file_name}: {ind}")
+        for ind in missing:
+            print(f"[Warning] Indicator not found in {file_name}: {ind}")
+        cols_to_select = base_cols + found
         
-        # Create a subset with only needed columns
-        subset_df = df[cols_to_select].drop_duplicates(subset=base_cols)
-        
-        # Merge subset with the main dataframe
-        if merged_df is None:
-            merged_df = subset_df
-            print(f"    ...Initialized merge with {file_name}")
+        # Parse only the needed columns (or defer to the streamed join)
+        if stream.PARTITIONS:
+            selected[file_name] = (header, cols_to_select)
         else:
-            merged_df = pd.merge(merged_df, subset_df, on=base_cols, how='outer')
-            print(f"    ...Merged data from {file_name}")
+            scans.append(
+                query.scan(file_name, header).select(*cols_to_select)
+                     .validate(validate.topic_schema(found), report)
+            )
+        print(f"    ...Selected {len(cols_to_select) - len(base_cols)} indicators from {file_name}")
             
     except Exception as e:
         print(f"[ERROR] Failed to process {file_name}: {e}")
 
-# Clean & save
-if merged_df is not None:
-    print("\n--- Finalizing Data ---")
-    
-    # Sort by country and year 
-    merged_df = merged_df.sort_values(by=['country', 'year'])
-    
-    merged_df = merged_df[merged_df['year'] >= 1990].copy()
-
-    # Save the final cohesive CSV
-    output_file = "education_health_gap_data.csv"
-    merged_df.to_csv(output_file, index=False)
-    
-    print(f"\n[SUCCESS] Successfully created '{output_file}'")
-    print(f"Final data shape: {merged_df.shape}")
-    print("Final columns:", merged_df.columns.tolist())
-    
+
+
+def group_sums(panel):
+    """Per (year, group) sums and counts of the positive gap metrics."""
+    groups = pd.Series(countries.map_codes(panel['country'], country_groups), index=panel.index, name='group')
+    metrics = [col for col in gap_metrics if col in panel.columns]
+    values = panel[metrics].where(panel[metrics] > 0)
+    return values.astype('float64').groupby([panel['year'], groups]).agg(['sum', 'count'])
+
+
+def group_means(totals):
+    """Yearly group means from group_sums (missing and zero values are ignored)."""
+    sums = totals.xs('sum', axis=1, level=1)
+    counts = totals.xs('count', axis=1, level=1)
+    return (sums / counts.where(counts > 0)).reset_index()
+
+
+output_file = "education_health_gap_data.csv"
+group_file = "education_gap_groups.json"
+
+if stream.PARTITIONS:
+    # Append each country partition to a partial CSV as it is joined (only
+    # the group sums are kept across partitions), then publish it whole
+    print(f"\n--- Streaming the join in {stream.PARTITIONS} country partitions ---")
+    totals = None
+    shape = [0, 0]
+    columns = None
+    partial_file = f"{output_file}.partial"
+    try:
+        for part in stream.iter_panel(selected, min_year=1990, report=report):
+            part = part.reset_index()[base_cols + part.columns.tolist()]
+            with stage('write', rows_in=len(part)):
+                part.to_csv(partial_file, mode='a' if columns else 'w', header=columns is None, index=False)
+            sums = group_sums(part)
+            totals = sums if totals is None else totals.add(sums, fill_value=0)
+            shape = [shape[0] + len(part), part.shape[1]]
+            columns = part.columns.tolist()
+
+        # The sources were checked as they were spilled; stop before publishing
+        report.finish()
+
+        if columns is not None:
+            publish(output_file, lambda tmp_path: os.replace(partial_file, tmp_path), rows=shape[0])
+    finally:
+        # Left behind when the checks or the join fail
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(partial_file)
+
+    if columns is not None:
+        print(f"\n[SUCCESS] Successfully created '{output_file}'")
+        print(f"Final data shape: {tuple(shape)}")
+        print("Final columns:", columns)
+
+        means = group_means(totals)
+        to_column_json(means, group_file)
+        print(f"[SUCCESS] Saved {len(means)} group-year means to '{group_file}'")
+    else:
+        print("\n[FAILED] No data was merged. Check if files exist and have correct columns.")
+
 else:
-    print("\n[FAILED] No data was merged. Check if files exist and have correct columns.")
+    # Join all subsets on (country, year) at once, reading only rows from 1990 on
+    panel = query.join(*scans).years(1990) if scans else None
+    merged_df = panel.collect() if panel is not None else None
+    report.finish()
+
+    # Clean & save
+    if merged_df is not None:
+        print("\n--- Finalizing Data ---")
+        print("Query plan:")
+        print(panel.explain())
+
+        # The join is already sorted by country and year; the CSV keeps its
+        # year, country column order
+        merged_df = merged_df.reset_index()[base_cols + merged_df.columns.tolist()]
+
+        # Save the final cohesive CSV
+        with stage('write', rows_in=len(merged_df)):
+            to_csv(merged_df, output_file)
+
+        print(f"\n[SUCCESS] Successfully created '{output_file}'")
+        print(f"Final data shape: {merged_df.shape}")
+        print("Final columns:", merged_df.columns.tolist())
+
+        # Yearly group means for the q6 charts
+        means = group_means(group_sums(merged_df))
+        to_column_json(means, group_file)
+        print(f"[SUCCESS] Saved {len(means)} group-year means to '{group_file}'")
+
+    else:
+        print("\n[FAILED] No data was merged. Check if files exist and have correct columns.")
@@ -0,0 +1,140 @@
+"""
+Column-pruned reader for the wide World Bank topic CSVs.
+Headers are normalized from the header row alone, then only the requested
+year/country/indicator columns are parsed, using compact dtypes. Indicator
+entries that are not plain numbers go through to_number.
+Parsed files are served from topic_cache when pyarrow is available.
+"""
+
+import pandas as pd
+
+import topic_cache
+from profiling import profiled
+
+BASE_COLS = ['year', 'country']
+
+# Compact dtypes for the key columns; every other column is an indicator value
+KEY_DTYPES = {
+    'year': 'int16',
+    'country': 'category',
+    'country code': 'category'
+}
+VALUE_DTYPE = 'float32'
+
+
+def normalize_column(col):
+    return col.strip().lower()
+
+
+def read_header(file_name):
+    """Map each normalized column name in file_name to its raw header."""
+    raw_cols = pd.read_csv(file_name, nrows=0).columns
+    return {normalize_column(col): col for col in raw_cols}
+
+
+@profiled('load')
+def read_columns(file_name, columns, header=None, value_dtype=VALUE_DTYPE, min_year=None, max_year=None):
+    """
+    Parse only the given normalized columns of file_name, keeping only rows
+    from min_year to max_year when given ('year' must then be a column).
+    The returned frame has normalized headers in the order requested.
+    """
+    if header is None:
+        header = read_header(file_name)
+
+    missing = [col for col in columns if col not in header]
+    if missing:
+        raise KeyError(f"Columns not found in {file_name}: {missing}")
+    years = None
+    if min_year is not None or max_year is not None:
+        if 'year' not in columns:
+            raise KeyError(f"A year range needs the 'year' column of {file_name}")
+        years = (min_year, max_year)
+
+    df = topic_cache.load(file_name, parse_topic, columns, years)
+    if df is not None:
+        return cast_columns(df, value_dtype)
+
+    raw_cols = [header[col] for col in columns]
+    df = pd.read_csv(
+        file_name,
+        usecols=raw_cols,
+        dtype={header[col]: KEY_DTYPES[col] for col in columns if col in KEY_DTYPES}
+    )
+    df.columns = [normalize_column(col) for col in df.columns]
+    if years is not None:
+        keep = pd.Series(True, index=df.index)
+        if min_year is not None:
+            keep &= df['year'] >= min_year
+        if max_year is not None:
+            keep &= df['year'] <= max_year
+        df = df[keep].reset_index(drop=True)
+    return cast_columns(df[columns], value_dtype)
+
+
+def iter_columns(file_name, columns, header=None, min_year=None, chunksize=100_000,
+                 value_dtype=VALUE_DTYPE):
+    """
+    Like read_columns, but yield the file in chunks of up to chunksize rows,
+    keeping only rows from min_year on.
+    """
+    if header is None:
+        header = read_header(file_name)
+
+    missing = [col for col in columns if col not in header]
+    if missing:
+        raise KeyError(f"Columns not found in {file_name}: {missing}")
+
+    reader = pd.read_csv(
+        file_name,
+        usecols=[header[col] for col in columns],
+        dtype={header[col]: KEY_DTYPES[col] for col in columns if col in KEY_DTYPES},
+        chunksize=chunksize
+    )
+    for chunk in reader:
+        chunk.columns = [normalize_column(col) for col in chunk.columns]
+        if min_year is not None:
+            chunk = chunk[chunk['year'] >= min_year]
+        if len(chunk):
+            yield cast_columns(chunk[columns], value_dtype)
+
+
+def to_number(values, pattern=r"([\d\.]+)"):
+    """
+    Coerce values to floats. Entries pd.to_numeric rejects (e.g. '85.2%')
+    fall back to the first number pattern extracts from them.
+    """
+    numbers = pd.to_numeric(values, errors='coerce')
+    failed = numbers.isna() & values.notna()
+    if failed.any():
+        extracted = values[failed].astype(str).str.extract(pattern, expand=False)
+        numbers = numbers.astype('float64')
+        numbers[failed] = pd.to_numeric(extracted, errors='coerce')
+    return numbers
+
+
+def parse_values(df):
+    """
+    Replace the indicator columns read_csv left as text (any entry it could
+    not parse, e.g. '38.3%') with to_number's floats.
+    """
+    for col in df.columns:
+        if col not in KEY_DTYPES and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = to_number(df[col])
+    return df
+
+
+def cast_columns(df, value_dtype=VALUE_DTYPE):
+    """Cast key columns to their KEY_DTYPES and indicator values to value_dtype."""
+    return parse_values(df).astype({col: KEY_DTYPES.get(col, value_dtype) for col in df.columns})
+
+
+def parse_topic(file_name):
+    """Parse a whole topic CSV with normalized headers, for the cache."""
+    df = pd.read_csv(file_name)
+    df.columns = [normalize_column(col) for col in df.columns]
+    for col, dtype in KEY_DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    return parse_values(df)
+
@@ -0,0 +1,136 @@
+"""
+Parallel KMeans sweep over k, seeds and feature subsets.
+The standardized matrix is placed in shared memory once (or, when it is
+already a memory-mapped .npy from feature_store, the file itself is mapped)
+and every worker maps it instead of receiving a pickled copy. Each fit reports inertia,
+silhouette and run time, and results are cached on disk keyed by the matrix
+contents and fit parameters, so repeated sweeps only run new fits.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from multiprocessing import shared_memory
+
+import numpy as np
+import sklearn
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+
+from artifacts import atomic_write
+from stream import MP_CONTEXT
+from topic_cache import CACHE_DIR
+
+SWEEP_CACHE = os.path.join(CACHE_DIR, 'kmeans_sweep.json')
+
+# Set in each worker by _attach or _attach_file
+_shm = None
+_X = None
+
+
+def feature_subsets(features, min_size=2):
+    """Every subset of features with at least min_size members, largest first."""
+    subsets = []
+    for size in range(len(features), min_size - 1, -1):
+        subsets.extend(list(subset) for subset in combinations(features, size))
+    return subsets
+
+
+def _attach(name, shape, dtype):
+    global _shm, _X
+    _shm = shared_memory.SharedMemory(name=name)
+    _X = np.ndarray(shape, dtype=dtype, buffer=_shm.buf)
+
+
+def _attach_file(path):
+    global _X
+    _X = np.load(path, mmap_mode='r')
+
+
+def _fit(k, seed, cols, n_init):
+    X = _X[:, cols]
+    start = time.perf_counter()
+    kmeans = KMeans(n_clusters=k, random_state=seed, n_init=n_init)
+    labels = kmeans.fit_predict(X)
+    seconds = time.perf_counter() - start
+    return {
+        'inertia': float(kmeans.inertia_),
+        'silhouette': float(silhouette_score(X, labels)),
+        'seconds': seconds
+    }
+
+
+def _load_cache():
+    if not os.path.exists(SWEEP_CACHE):
+        return {}
+    with open(SWEEP_CACHE) as f:
+        return json.load(f)
+
+
+def _save_cache(cache):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with atomic_write(SWEEP_CACHE) as f:
+        json.dump(cache, f)
+
+
+def sweep(X, features, ks=range(2, 9), seeds=(42,), subsets=None, n_init=10, jobs=None):
+    """
+    Fit KMeans for every (feature subset, k, seed) on the standardized X,
+    whose columns are named by features. Returns one dict per fit.
+    """
+    mapped = None
+    if isinstance(X, np.memmap) and X.filename and X.flags.c_contiguous:
+        # Only a whole mapped file can be mapped again by the workers
+        whole = np.load(X.filename, mmap_mode='r')
+        if whole.shape == X.shape and whole.dtype == X.dtype:
+            mapped = X.filename
+    X = np.ascontiguousarray(X)
+    subsets = subsets or [list(features)]
+    data_key = hashlib.sha256(X.tobytes() + json.dumps(list(features)).encode()).hexdigest()
+
+    tasks, results = [], []
+    cache = _load_cache()
+    for subset in subsets:
+        cols = [features.index(feat) for feat in subset]
+        for k in ks:
+            for seed in seeds:
+                params = [data_key, subset, k, seed, n_init, sklearn.__version__]
+                key = hashlib.sha256(json.dumps(params).encode()).hexdigest()
+                row = {'k': k, 'seed': seed, 'features': subset}
+                if key in cache:
+                    results.append({**row, **cache[key], 'cached': True})
+                else:
+                    tasks.append((key, row, cols))
+
+    if tasks:
+        shm = None
+        if mapped:
+            initializer, initargs = _attach_file, (mapped,)
+        else:
+            shm = shared_memory.SharedMemory(create=True, size=X.nbytes)
+            np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[:] = X
+            initializer, initargs = _attach, (shm.name, X.shape, X.dtype.str)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=jobs or os.cpu_count(),
+                mp_context=MP_CONTEXT,
+                initializer=initializer,
+                initargs=initargs
+            ) as pool:
+                futures = [
+                    (key, row, pool.submit(_fit, row['k'], row['seed'], cols, n_init))
+                    for key, row, cols in tasks
+                ]
+                for key, row, future in futures:
+                    cache[key] = future.result()
+                    results.append({**row, **cache[key], 'cached': False})
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        _save_cache(cache)
+
+    return results
@@ -0,0 +1,53 @@
+"""
+Shared body of the Observable data loaders in src/data (e.g. q1.csv.py).
+With WORLD_BANK_DATA_DIR set to a directory of raw World Bank topic CSVs, a
+loader brings its pipeline stage up to date there and streams the stage's
+output to stdout. Without it, the loader streams the checked-in snapshot
+from src/data/snapshots, so the site builds without the raw data.
+"""
+
+import contextlib
+import fcntl
+import os
+import shutil
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SITE_DATA_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), 'data')
+SNAPSHOT_DIR = os.path.join(SITE_DATA_DIR, 'snapshots')
+LOCK_FILE = '.pipeline.lock'
+
+
+def emit(stage, output, snapshot):
+    """Write the up-to-date output of stage (or the snapshot) to stdout."""
+    data_dir = os.environ.get('WORLD_BANK_DATA_DIR')
+
+    if not data_dir:
+        # Snapshots are plain files; copying one needs nothing beyond the stdlib
+        with open(os.path.join(SNAPSHOT_DIR, snapshot), 'rb') as f:
+            shutil.copyfileobj(f, sys.stdout.buffer)
+        return
+
+    # The pipeline needs pandas and pyarrow (requirements.txt)
+    import frames
+    import pipeline
+
+    if os.path.realpath(data_dir) == os.path.realpath(SITE_DATA_DIR):
+        # Stage outputs written here would shadow the loaders themselves
+        sys.exit("[ERROR] WORLD_BANK_DATA_DIR must not be src/data")
+    os.chdir(data_dir)
+
+    # The framework runs loaders concurrently; one pipeline run at a time
+    # per directory, and stages already brought up to date are skipped
+    with open(LOCK_FILE, 'w') as lock, contextlib.redirect_stdout(sys.stderr):
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        failed = pipeline.run([stage])
+    if failed:
+        sys.exit(f"[ERROR] Pipeline stages failed: {', '.join(failed)}")
+
+    if output.endswith('.feather'):
+        # Typed intermediate tables are published as CSV
+        frames.to_csv(output, sys.stdout)
+        return
+    with open(output, 'rb') as f:
+        shutil.copyfileobj(f, sys.stdout.buffer)
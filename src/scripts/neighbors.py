@@ -0,0 +1,54 @@
+"""
+"Similar countries" lookups over the standardized cluster features.
+A KD-tree per year answers each country's k nearest neighbours once, and a
+PCA projection gives 2-D coordinates for plotting, so the pages read both
+from a precomputed artifact instead of scanning every pair client-side.
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import PCA
+from sklearn.neighbors import KDTree
+
+
+def project(X, n_components=2, random_state=42):
+    """PCA coordinates of the rows of X and the fitted PCA."""
+    pca = PCA(n_components=n_components, random_state=random_state)
+    return pca.fit_transform(X), pca
+
+
+def nearest(X, k=5, groups=None):
+    """
+    Positions and distances of each row's k nearest other rows, searched
+    only within the row's group (e.g. its year) when groups is given.
+    Rows in groups smaller than k + 1 get fewer neighbours, padded with -1
+    and NaN.
+    """
+    X = np.asarray(X)
+    groups = np.zeros(len(X), dtype=int) if groups is None else np.asarray(groups)
+    positions = np.full((len(X), k), -1)
+    distances = np.full((len(X), k), np.nan)
+
+    for group in pd.unique(groups):
+        rows = np.flatnonzero(groups == group)
+        found = min(k + 1, len(rows))
+        dist, ind = KDTree(X[rows]).query(X[rows], k=found)
+        for i, row in enumerate(rows):
+            # Drop the row itself (not necessarily first when rows tie)
+            keep = ind[i] != i
+            hits = rows[ind[i][keep]][:k]
+            positions[row, :len(hits)] = hits
+            distances[row, :len(hits)] = dist[i][keep][:k]
+    return positions, distances
+
+
+def table(keys, positions, distances, decimals=4):
+    """
+    keys (country, year, ...) with a list of neighbour countries and their
+    distances per row, ready for artifacts.to_column_json.
+    """
+    countries = keys['country'].to_numpy()
+    result = keys.reset_index(drop=True).copy()
+    result['neighbors'] = [countries[row[row >= 0]].tolist() for row in positions]
+    result['distances'] = [np.round(dist[~np.isnan(dist)], decimals).tolist() for dist in distances]
+    return result
@@ -0,0 +1,128 @@
+"""
+Operations on (country, year) panels assembled from the topic files.
+"""
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+
+PANEL_INDEX = ['country', 'year']
+
+
+@profiled('merge')
+def outer_join(frames, keys=PANEL_INDEX):
+    """
+    Outer-join frames on keys in a single aligned concat.
+    Each frame keeps the first row of any duplicated key. Returns a frame
+    indexed and sorted by keys, or None when there is nothing to join.
+    """
+    indexed = []
+    for df in frames:
+        df = df.set_index(keys)
+        indexed.append(df[~df.index.duplicated(keep='first')])
+
+    if not indexed:
+        return None
+
+    merged = pd.concat(indexed, axis=1, join='outer').sort_index()
+    merged.index.names = keys
+    return merged
+
+
+@profiled('snapshot')
+def latest(df, columns=None, as_of=None, max_age=None, by='country', time='year'):
+    """
+    Most recent non-null value of each column per country, in one pass.
+    df is a panel indexed by (by, time) or holding them as columns. Rows after
+    as_of are ignored, and with max_age a value only counts if it is at most
+    max_age years older than as_of (or than the country's latest year when
+    as_of is not given). Returns one row per country with the year of its
+    latest row and the selected columns.
+    """
+    if list(df.index.names) != [by, time]:
+        df = df.set_index([by, time])
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    if columns is not None:
+        df = df[columns]
+
+    years = df.index.get_level_values(time)
+    if as_of is not None:
+        df = df[years <= as_of]
+        years = df.index.get_level_values(time)
+
+    last_year = pd.Series(years, index=df.index).groupby(level=by, observed=True).transform('max')
+    if max_age is not None:
+        ref_year = last_year if as_of is None else as_of
+        df = df.where(pd.Series(ref_year - years <= max_age, index=df.index), axis=0)
+
+    snapshot = df.groupby(level=by, sort=False, observed=True).last()
+    snapshot.insert(0, time, last_year.groupby(level=by, sort=False, observed=True).last())
+    return snapshot.reset_index()
+
+
+def bucket(values, edges, labels):
+    """
+    Ordered categorical of values binned into (edges[i], edges[i+1]], the
+    first bin including edges[0]; like pd.cut(..., include_lowest=True).
+    Values outside the edges are missing.
+    """
+    edges = np.asarray(edges)
+    x = np.asarray(values, dtype='float64')
+    codes = np.searchsorted(edges, x, side='left') - 1
+    codes[x == edges[0]] = 0
+    codes[np.isnan(x) | (x < edges[0]) | (x > edges[-1])] = -1
+    return pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+
+
+def quantile_tiers(values, labels, by=None):
+    """
+    Ordered categorical of the quantile tier of each value, within groups of
+    by if given; the same bins as pd.qcut(values, len(labels)) per group.
+    A value at sorted position k (the first of its ties) of n lies above the
+    tier boundary at p when k > floor(p * (n - 1)), so tiers come from one
+    grouped rank instead of per-group quantile edges.
+    """
+    values = pd.Series(values)
+    grouped = values.groupby(by, sort=False, observed=True) if by is not None else values
+    k = np.asarray(grouped.rank(method='min'), dtype='float64') - 1
+    n = np.asarray(grouped.transform('count') if by is not None else np.full(len(values), values.count()),
+                   dtype='float64')
+
+    bounds = np.floor(np.linspace(0, 1, len(labels) + 1)[1:-1] * (n[:, None] - 1))
+    codes = (k[:, None] > bounds).sum(axis=1)
+    codes[np.isnan(k)] = -1
+    return pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+
+
+@profiled('asof')
+def asof_join(left, right, left_by, right_by='country', time='year', tolerance=None):
+    """
+    Attach to each left row the latest non-null right value for the same key
+    at or before its year, optionally no more than tolerance years older.
+    Left rows keep their order; every right column other than the keys is
+    joined on its own, so sparse indicators fill independently.
+    """
+    value_cols = [col for col in right.columns if col not in (right_by, time)]
+
+    keyed = left[[left_by, time]].copy()
+    keyed['_row'] = range(len(keyed))
+    keyed = keyed.sort_values(time, kind='stable')
+
+    right = right.astype({right_by: keyed[left_by].dtype, time: keyed[time].dtype})
+
+    result = left.copy()
+    for col in value_cols:
+        observed = right.loc[right[col].notna(), [right_by, time, col]].sort_values(time, kind='stable')
+        matched = pd.merge_asof(
+            keyed,
+            observed,
+            on=time,
+            left_by=left_by,
+            right_by=right_by,
+            tolerance=tolerance,
+            direction='backward'
+        )
+        result[col] = matched.set_index('_row')[col].sort_index().to_numpy()
+    return result
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Incremental runner for the data preparation scripts.
+Each stage declares the files it reads and writes; the runner orders stages
+by those files, skips a stage when its code and inputs hash the same as on
+its last successful run, and runs independent stages side by side.
+
+Usage (from the directory holding the raw topic CSVs):
+    python path/to/pipeline.py [stage ...] [--jobs N] [--force] [--dry-run] [--profile DIR]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import profiling
+from artifacts import atomic_write, digest
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STAMP_FILE = '.pipeline_stamps.json'
+
+# Modules imported by the stage scripts; editing one reruns every stage
+SHARED_MODULES = ['ingest.py', 'topic_cache.py', 'panel.py', 'artifacts.py', 'stream.py', 'profiling.py', 'frames.py', 'catalog.py', 'query.py', 'validate.py', 'countries.py',
+                  'cluster_model.py', 'feature_store.py', 'kmeans_sweep.py', 'neighbors.py', 'trajectories.py']
+
+TOPIC_FILES = [
+    'agriculture_rural_development.csv', 'aid_effectiveness.csv',
+    'climate_change.csv', 'economy_growth.csv', 'education.csv',
+    'environment.csv', 'external_debt.csv', 'financial_sector.csv',
+    'infrastructure.csv', 'poverty.csv', 'private_sector.csv'
+]
+
+STAGES = {
+    'q1': {
+        'script': 'Q1_script.py',
+        'inputs': ['world_bank_indicators.csv', 'country_meta.csv'],
+        'outputs': ['clean/gdp_lifeexpectancy.feather']
+    },
+    'q2': {
+        'script': 'Q2_script.py',
+        'inputs': ['clean/gdp_lifeexpectancy.feather', 'education.csv', 'country_meta.csv'],
+        'outputs': ['clean/q2_gdp_life_literacy.feather', 'clean/q2_panel.feather']
+    },
+    'q3': {
+        'script': 'Q3_script.py',
+        'inputs': ['clean/q2_gdp_life_literacy.feather', 'poverty.csv', 'country_meta.csv'],
+        'outputs': ['clean/q3_poverty_filled.feather']
+    },
+    'q4': {
+        'script': 'Q4_script.py',
+        'inputs': ['clean/q3_poverty_filled.feather', 'environment.csv', 'country_meta.csv'],
+        'outputs': ['clean/q4_env_merged.feather']
+    },
+    'socioeconomic': {
+        'script': 'clustering.py',
+        'inputs': TOPIC_FILES + ['country_meta.csv'],
+        'outputs': ['socioeconomic_profiles.csv']
+    },
+    'gap_narrowing': {
+        'script': 'gap_narrowing.py',
+        'inputs': TOPIC_FILES + ['country_meta.csv'],
+        'outputs': ['education_health_gap_data.csv', 'education_gap_groups.json']
+    },
+    'prosperity': {
+        'script': 'prosperity_and_sustainability.py',
+        'inputs': TOPIC_FILES + ['country_meta.csv'],
+        'outputs': ['prosperity_sustainability.csv', 'prosperity_sustainability_panel.csv', 'prosperity_profiles.json']
+    },
+    'clusters': {
+        'script': 'cluster_prosperity.py',
+        # The script's defaults point into src/data; keep everything in the data directory
+        'args': ['--input', 'prosperity_sustainability.csv', '--model', 'prosperity_kmeans.json',
+                 '--output', 'country_clusters.csv', '--neighbors', 'country_neighbors.json'],
+        'inputs': ['prosperity_sustainability.csv'],
+        'outputs': ['country_clusters.csv', 'country_neighbors.json', 'prosperity_kmeans.json']
+    }
+}
+
+
+def upstream(stages):
+    """Map each stage to the stages producing its inputs."""
+    producers = {}
+    for name, stage in stages.items():
+        for out in stage['outputs']:
+            producers[out] = name
+    return {
+        name: sorted({producers[inp] for inp in stage['inputs'] if inp in producers} - {name})
+        for name, stage in stages.items()
+    }
+
+
+def with_dependencies(targets, deps):
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(deps[name])
+    return selected
+
+
+def topological_order(names, deps):
+    order, done = [], set()
+
+    def visit(name, path):
+        if name in done:
+            return
+        if name in path:
+            raise ValueError(f"Dependency cycle through stage '{name}'")
+        for dep in deps[name]:
+            if dep in names:
+                visit(dep, path | {name})
+        done.add(name)
+        order.append(name)
+
+    for name in sorted(names):
+        visit(name, set())
+    return order
+
+
+def digest_or_none(path):
+    return digest(path) if os.path.exists(path) else None
+
+
+def stage_stamp(stage):
+    """Hashes of the stage's code and inputs as they are right now."""
+    code = [stage['script']] + SHARED_MODULES
+    return {
+        'code': {f: digest_or_none(os.path.join(SCRIPTS_DIR, f)) for f in code},
+        'inputs': {f: digest_or_none(f) for f in stage['inputs']}
+    }
+
+
+def is_stale(name, stage, stamps):
+    if any(not os.path.exists(out) for out in stage['outputs']):
+        return True
+    return stamps.get(name) != stage_stamp(stage)
+
+
+def stage_command(stage, python=()):
+    """Command line running the stage's script, after the python options given."""
+    return [sys.executable, *python, os.path.join(SCRIPTS_DIR, stage['script'])] + stage.get('args', [])
+
+
+def run_stage(stage, profile_dir=None):
+    command = stage_command(stage)
+    env = None
+    if profile_dir:
+        # Stage records from the script plus a cProfile dump per script
+        log = os.path.join(profile_dir, 'stages.jsonl')
+        dump = os.path.join(profile_dir, os.path.splitext(stage['script'])[0] + '.prof')
+        command = stage_command(stage, ['-m', 'cProfile', '-o', dump])
+        env = {**os.environ, 'PIPELINE_PROFILE': log}
+
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, env=env)
+    if profile_dir:
+        profiling.emit({
+            'script': stage['script'],
+            'stage': 'run',
+            'depth': -1,
+            'wall_s': round(time.perf_counter() - start, 6),
+            'returncode': result.returncode,
+            'time': time.time()
+        }, log)
+    return result.returncode, result.stdout + result.stderr
+
+
+def load_stamps():
+    if not os.path.exists(STAMP_FILE):
+        return {}
+    with open(STAMP_FILE) as f:
+        return json.load(f)
+
+
+def save_stamps(stamps):
+    with atomic_write(STAMP_FILE) as f:
+        json.dump(stamps, f, indent=2, sort_keys=True)
+
+
+def run(targets=None, jobs=None, force=False, dry_run=False, profile_dir=None, stages=STAGES):
+    """
+    Bring the targets (default: every stage) up to date. Returns failed stage names.
+    With profile_dir, stages log their profiling records and cProfile dumps there.
+    """
+    deps = upstream(stages)
+    selected = with_dependencies(targets or list(stages), deps)
+    order = topological_order(selected, deps)
+    stamps = load_stamps()
+
+    if dry_run:
+        # A stage downstream of a stale one reruns too, since its inputs will change
+        stale = set()
+        for name in order:
+            if force or is_stale(name, stages[name], stamps) or any(dep in stale for dep in deps[name]):
+                stale.add(name)
+            state = 'stale' if name in stale else 'up to date'
+            print(f"[Plan] {name} ({stages[name]['script']}): {state}")
+        return []
+
+    done, failed, running = set(), set(), {}
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        while len(done) + len(failed) < len(order):
+            for name in order:
+                if name in done or name in failed or name in running.values():
+                    continue
+                if any(dep in failed for dep in deps[name] if dep in selected):
+                    print(f"[Skipped] {name}: an upstream stage failed")
+                    failed.add(name)
+                    continue
+                if not all(dep in done for dep in deps[name] if dep in selected):
+                    continue
+                stage = stages[name]
+                if not force and not is_stale(name, stage, stamps):
+                    print(f"[Up to date] {name}")
+                    done.add(name)
+                    continue
+                print(f"[Running] {name} ({stage['script']})")
+                for out in stage['outputs']:
+                    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+                running[pool.submit(run_stage, stage, profile_dir)] = name
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                returncode, output = future.result()
+                if returncode == 0:
+                    stamps[name] = stage_stamp(stages[name])
+                    save_stamps(stamps)
+                    done.add(name)
+                    print(f"[Done] {name}")
+                else:
+                    failed.add(name)
+                    print(f"[ERROR] {name} exited with {returncode}:\n{output}")
+
+    return sorted(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('stages', nargs='*', metavar='stage',
+                        help=f"stages to bring up to date, with their dependencies ({', '.join(STAGES)})")
+    parser.add_argument('--jobs', type=int, default=None, help="stages to run at once (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="rerun stages even if up to date")
+    parser.add_argument('--dry-run', action='store_true', help="print which stages would run")
+    parser.add_argument('--profile', metavar='DIR', default=None,
+                        help="write stage timings (stages.jsonl) and cProfile dumps of the stages that run to DIR")
+    args = parser.parse_args()
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+    failed = run(args.stages, jobs=args.jobs, force=args.force, dry_run=args.dry_run,
+                 profile_dir=args.profile and os.path.abspath(args.profile))
+    if failed:
+        print(f"\n[FAILED] Stages failed: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
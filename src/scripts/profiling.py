@@ -0,0 +1,139 @@
+"""
+Stage-level instrumentation for the pipeline scripts.
+Wrap a step in `with stage('merge', rows_in=n) as s:` (setting s.rows_out
+inside) or decorate a function with `@profiled('merge')`. With
+PIPELINE_PROFILE set to a file path, each stage appends one JSON line with
+its wall and CPU time, the process's peak RSS, tracemalloc's net and peak
+allocation during the stage, and the rows in and out. Without it the
+instrumentation does nothing.
+
+    python profiling.py stages.jsonl    # summarize a profile log
+"""
+
+import contextlib
+import functools
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+PROFILE_LOG = os.environ.get('PIPELINE_PROFILE')
+
+_open = []
+
+
+class Stage:
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.child_peak = 0
+
+
+def count_rows(obj):
+    """Row count of a frame, or the total over a list of frames; None otherwise."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, (list, tuple)) and obj and all(isinstance(o, pd.DataFrame) for o in obj):
+        return sum(len(o) for o in obj)
+    return None
+
+
+def rss_mb(maxrss):
+    """An ru_maxrss value in MB: Linux reports kilobytes, macOS bytes."""
+    return maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def peak_rss_mb():
+    return rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def emit(record, path=None):
+    """Append one JSON line to the profile log."""
+    path = path or PROFILE_LOG
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+@contextlib.contextmanager
+def stage(name, rows_in=None):
+    """Time and measure the enclosed block as one stage."""
+    record = Stage(name, rows_in)
+    if not PROFILE_LOG:
+        yield record
+        return
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    mem_before = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    _open.append(record)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        mem_after, mem_peak = tracemalloc.get_traced_memory()
+        _open.pop()
+        # A nested stage reset the peak; carry its peak up to this one
+        mem_peak = max(mem_peak, record.child_peak)
+        if _open:
+            _open[-1].child_peak = max(_open[-1].child_peak, mem_peak)
+
+        emit({
+            'script': os.path.basename(sys.argv[0]),
+            'stage': name,
+            'depth': len(_open),
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'peak_rss_mb': round(peak_rss_mb(), 2),
+            'alloc_mb': round((mem_after - mem_before) / 2**20, 3),
+            'alloc_peak_mb': round((mem_peak - mem_before) / 2**20, 3),
+            'rows_in': record.rows_in,
+            'rows_out': record.rows_out,
+            'pid': os.getpid(),
+            'time': time.time()
+        })
+
+
+def profiled(name):
+    """Decorator form of stage; rows in/out are counted from the frame arguments and result."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILE_LOG:
+                return func(*args, **kwargs)
+            rows = [count_rows(arg) for arg in list(args) + list(kwargs.values())]
+            rows = [n for n in rows if n is not None]
+            with stage(name, rows_in=sum(rows) if rows else None) as record:
+                result = func(*args, **kwargs)
+                record.rows_out = count_rows(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def summarize(path):
+    """Total wall/CPU time, calls and peaks per script and stage in a profile log."""
+    records = pd.read_json(path, lines=True)
+    total = lambda values: values.sum(min_count=1)
+    return records.groupby(['script', 'stage'], sort=False).agg(
+        calls=('wall_s', 'size'),
+        wall_s=('wall_s', 'sum'),
+        cpu_s=('cpu_s', total),
+        peak_rss_mb=('peak_rss_mb', 'max'),
+        alloc_peak_mb=('alloc_peak_mb', 'max'),
+        rows_in=('rows_in', total),
+        rows_out=('rows_out', total)
+    )
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+    with pd.option_context('display.width', 200, 'display.max_rows', None):
+        print(summarize(sys.argv[1]).to_string(float_format=lambda v: f"{v:.3f}"))
@@ -1,5 +1,17 @@
+import contextlib
+import os
+
 import pandas as pd
 
+import catalog
+import countries
+from ingest import BASE_COLS, read_columns
+from panel import PANEL_INDEX, asof_join, outer_join
+from artifacts import publish, to_column_json, to_csv
+from profiling import stage
+import stream
+import validate
+
 # Define file names
 files = [
     'aid_effectiveness.csv', 'climate_change.csv', 'economy_growth.csv',
@@ -8,36 +20,35 @@ files = [
     'private_sector.csv'
 ]
 
-# Cleaning data 
-dfs = {}
+# Cleaning column names (from the indicator catalog; data is read once the columns are known)
+headers = {}
 print("--- Step 1: Loading and Cleaning Columns ---")
+entries = catalog.load(files, cache=not stream.PARTITIONS)
 for f in files:
-    try:
-        df = pd.read_csv(f)
-        df.columns = [col.strip().lower() for col in df.columns]
-        dfs[f] = df
-        print(f"[SUCCESS] Loaded {f}. Cleaned columns: {df.columns.tolist()}")
-    except Exception as e:
-        print(f"[ERROR] Failed to load {f}: {e}")
+    if f in entries:
+        headers[f] = entries[f]['header']
+        print(f"[SUCCESS] Loaded header of {f}. Cleaned columns: {list(headers[f])}")
+    else:
+        print(f"[ERROR] Failed to load {f}: file not found")
 print("\n--- Step 2: Checking for 'year' and 'country' columns ---")
-base_cols = ['year', 'country']
-for f_name in list(dfs.keys()):
-    df = dfs[f_name]
+base_cols = BASE_COLS
+for f_name in list(headers.keys()):
+    header = headers[f_name]
     # Check for 'year' 
-    if 'year' not in df.columns:
+    if 'year' not in header:
         print(f"[WARNING] {f_name} is missing 'year' column. Removing from merge.")
-        del dfs[f_name]
+        del headers[f_name]
         continue
     
     # Check for 'country'
-    if 'country' not in df.columns:
+    if 'country' not in header:
         print(f"[WARNING] {f_name} is missing 'country' column. Removing from merge.")
-        del dfs[f_name]
+        del headers[f_name]
         continue 
         
     print(f"[INFO] {f_name} passed check.")
 print(f"\n--- Step 3: Starting merge with remaining files ---")
-print(f"Files to be merged: {list(dfs.keys())}")
+print(f"Files to be merged: {list(headers.keys())}")
 
 # Processing data and merging
 print("\n--- Step 4: Merging relevant indicators ---")
@@ -67,79 +78,154 @@ sustainability_sources = {
 }
 all_sources = {**prosperity_sources, **sustainability_sources}
 
-merged_df = None
+# Indicators the q7 page looks up at or before each country's year
+profile_lookups = {
+    'poverty.csv': ('poverty headcount ratio at $6.85 a day (2017 ppp) (% of population)', 'poverty'),
+    'education.csv': ('literacy rate, adult total (% of people ages 15 and above)', 'literacy')
+}
+profile_columns = {
+    'gdp per capita (current us$)': 'gdp',
+    'renewable energy consumption (% of total final energy consumption)': 'renewable',
+    'total greenhouse gas emissions excluding lulucf per capita (t co2e/capita)': 'ghg',
+    'inflation, consumer prices (annual %)': 'inflation'
+}
+
+
+def normalize_region(region):
+    """Collapse World Bank regions into the q7 legend groups."""
+    if not isinstance(region, str):
+        return "Other"
+    if "North America" in region:
+        return "North America"
+    if "Europe" in region or "Central Asia" in region:
+        return "Europe & Central Asia"
+    if "East Asia" in region or "Pacific" in region:
+        return "East Asia & Pacific"
+    if "Latin America" in region or "Caribbean" in region:
+        return "Latin America & Caribbean"
+    if "Middle East" in region or "North Africa" in region:
+        return "Middle East & N. Africa"
+    if "South Asia" in region:
+        return "South Asia"
+    if "Sub-Saharan Africa" in region:
+        return "Sub-Saharan Africa"
+    return "Other"
+
+subsets = []
+selected = {}
+report = validate.Report()
 
 # Iterate through each file 
 for file_name, desired_cols in all_sources.items():
-    if file_name in dfs:
-        df = dfs[file_name]
+    if file_name in headers:
+        header = headers[file_name]
         cols_to_select = base_cols.copy()
         found_cols = False
         for col in desired_cols:
-            if col in df.columns:
+            if col in header:
                 cols_to_select.append(col)
                 found_cols = True
         
         if found_cols:
             print(f"Selecting columns from {file_name}: {cols_to_select}")
-            subset_df = df[cols_to_select].drop_duplicates(subset=base_cols)
-            
-            if merged_df is None:
-                merged_df = subset_df
+            if stream.PARTITIONS:
+                selected[file_name] = (header, cols_to_select)
             else:
-                merged_df = pd.merge(merged_df, subset_df, on=base_cols, how='outer')
+                subset = read_columns(file_name, cols_to_select, header, min_year=2010)
+                schema = validate.topic_schema(cols_to_select[len(base_cols):])
+                subsets.append(report.check(subset, schema, file_name))
         else:
             print(f"[INFO] Could not find any of the desired indicators in {file_name}")
     else:
         print(f"[INFO] {file_name} was not in the list of files to merge. Skipping.")
 
-# Save data
-if merged_df is not None:
-    print("\n--- Step 5: Cleaning and Finalizing Data ---")
-    
-    merged_df = merged_df[merged_df['year'] >= 2010].copy()
-    print("Sorting by country and year...")
-    merged_df = merged_df.sort_values(by=['country', 'year'])
-    
-    print("Setting index to ['country', 'year']...")
-    merged_df = merged_df.set_index(['country', 'year'])
-    
-    print("Grouping by country and forward-filling...")
-    merged_df = merged_df.groupby(level='country').ffill()
-    
-    print("Resetting index...")
-    merged_df = merged_df.reset_index()
+print("\n--- Step 5: Cleaning and Finalizing Data ---")
+print("Selecting most recent data for each country...")
+# The country-year panel behind the snapshot, for trajectory clustering
+# (cluster_prosperity.py --panel); published once the checks pass
+panel_file = 'prosperity_sustainability_panel.csv'
+partial_panel = f"{panel_file}.partial"
+try:
+    if stream.PARTITIONS:
+        print(f"Streaming the join in {stream.PARTITIONS} country partitions...")
+        final_df = stream.snapshot(selected, min_year=2010, panel_file=partial_panel, report=report)
+    else:
+        # Join every subset (read from 2010 on) on (country, year) in one pass
+        merged_df = outer_join(subsets, keys=PANEL_INDEX)
+        final_df = stream.snapshot(merged_df, panel_file=partial_panel)
 
-    print("Selecting most recent data for each country...")
-    final_df = merged_df.drop_duplicates(subset=['country'], keep='last')
-    
-    print("Dropping rows with missing critical indicators...")
+    # Stop here, before writing anything, if the data failed its checks
+    report.finish()
+
+    # Save data
+    if final_df is not None:
+        print("Dropping rows with missing critical indicators...")
     
-    gdp_col_found = None
-    if 'gdp per capita (current us$)' in final_df.columns:
-        gdp_col_found = 'gdp per capita (current us$)'
-    elif 'gdp (current us$)' in final_df.columns:
-        gdp_col_found = 'gdp (current us$)'
-
-    critical_indicators = [
-        gdp_col_found,
-        'total greenhouse gas emissions excluding lulucf per capita (t co2e/capita)',
-        'renewable energy consumption (% of total final energy consumption)'
-    ]
-    critical_indicators = [col for col in critical_indicators if col is not None and col in final_df.columns]
+        gdp_col_found = None
+        if 'gdp per capita (current us$)' in final_df.columns:
+            gdp_col_found = 'gdp per capita (current us$)'
+        elif 'gdp (current us$)' in final_df.columns:
+            gdp_col_found = 'gdp (current us$)'
 
-    if critical_indicators:
-        print(f"Dropping rows missing critical indicators: {critical_indicators}")
-        final_df = final_df.dropna(subset=critical_indicators)
-    else:
-        print("Warning: No critical indicators found. Dropping rows with any NaNs.")
-        final_df = final_df.dropna()
+        critical_indicators = [
+            gdp_col_found,
+            'total greenhouse gas emissions excluding lulucf per capita (t co2e/capita)',
+            'renewable energy consumption (% of total final energy consumption)'
+        ]
+        critical_indicators = [col for col in critical_indicators if col is not None and col in final_df.columns]
+
+        if critical_indicators:
+            print(f"Dropping rows missing critical indicators: {critical_indicators}")
+            final_df = final_df.dropna(subset=critical_indicators)
+        else:
+            print("Warning: No critical indicators found. Dropping rows with any NaNs.")
+            final_df = final_df.dropna()
         
-    output_csv = 'prosperity_sustainability.csv'
-    final_df.to_csv(output_csv, index=False)
+        output_csv = 'prosperity_sustainability.csv'
+        with stage('write', rows_in=len(final_df)):
+            to_csv(final_df, output_csv)
+            publish(panel_file, lambda tmp_path: os.replace(partial_panel, tmp_path))
     
-    print(f"\n[FINAL SUCCESS] Successfully preprocessed and saved data to '{output_csv}'")
-    print(f"Final DataFrame shape: {final_df.shape}")
+        print(f"\n[FINAL SUCCESS] Successfully preprocessed and saved data to '{output_csv}'")
+        print(f"Final DataFrame shape: {final_df.shape}")
+        print(f"Saved the country-year panel since 2010 to '{panel_file}'")
+finally:
+    # Left behind when the checks or the join fail
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(partial_panel)
+
+if final_df is not None:
+    print("\n--- Step 6: Building the q7 profile artifact ---")
+    profiles = final_df.reindex(columns=['country', 'year'] + list(profile_columns))
+    profiles = profiles.rename(columns=profile_columns)
+    profiles['country'] = profiles['country'].astype(str)
+
+    for file_name, (indicator, name) in profile_lookups.items():
+        if file_name in headers and indicator in headers[file_name]:
+            values = read_columns(file_name, ['country', 'year', indicator], headers[file_name])
+            values = values[values['year'] >= 1990].rename(columns={indicator: name})
+            profiles = asof_join(profiles, values, left_by='country')
+        else:
+            print(f"[INFO] {indicator} not available from {file_name}")
+            profiles[name] = float('nan')
+
+    # Countries in the metadata, with their names and regions attached by key
+    keys = countries.keys(profiles['country'])
+    known = keys != countries.UNKNOWN
+    profiles = pd.concat([
+        profiles[known].reset_index(drop=True),
+        countries.lookup(keys[known], ['country_name', 'region'])
+    ], axis=1)
+    profiles['region'] = profiles['region'].map(normalize_region)
+    profiles = profiles[profiles['region'] != "Other"]
+    profiles['country'] = profiles['country_name']
+
+    profile_file = 'prosperity_profiles.json'
+    to_column_json(
+        profiles[['country', 'region', 'year', 'gdp', 'renewable', 'poverty', 'ghg', 'inflation', 'literacy']],
+        profile_file
+    )
+    print(f"[SUCCESS] Saved {len(profiles)} country profiles to '{profile_file}'")
 
 else:
     print("\n--- FINAL ERROR ---")
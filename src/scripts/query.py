@@ -0,0 +1,301 @@
+"""
+Lazy queries over the topic files.
+A script describes its panel as scans of topic files followed by column
+selections, year filters, data-quality checks (validate.py), an outer join
+on (country, year) and a latest snapshot; nothing is read until collect(). Before running, the plan is
+rewritten so year ranges and column selections reach the scans: every scan
+reads only the columns some later step uses and only rows in the year
+range, so the joined frame is the largest thing materialized.
+
+    panel = query.join(query.scan('poverty.csv').select(...),
+                       query.scan('education.csv').select(...)).years(2010)
+    print(panel.snapshot().explain())
+    snapshot = panel.snapshot().collect()
+
+explain() prints the optimized plan; after collect() it also shows each
+step's output rows and its own (exclusive) run time.
+"""
+
+import time
+
+import numpy as np
+
+from ingest import BASE_COLS, read_columns, read_header
+from panel import PANEL_INDEX, latest, outer_join
+
+
+class Node:
+    label = ''
+
+    def __init__(self, *inputs):
+        self.inputs = list(inputs)
+        self.rows = None
+        self.seconds = None
+
+    def describe(self):
+        return self.label
+
+    def columns(self):
+        """Columns this step outputs."""
+        raise NotImplementedError
+
+    def run(self, frames):
+        raise NotImplementedError
+
+    def execute(self):
+        frames = [node.execute() for node in self.inputs]
+        start = time.perf_counter()
+        df = self.run(frames)
+        self.seconds = time.perf_counter() - start
+        self.rows = len(df)
+        return df
+
+
+class Scan(Node):
+    label = 'scan'
+
+    def __init__(self, file_name, header=None, keep=None, first=None, last=None):
+        super().__init__()
+        self.file_name = file_name
+        self.header = header if header is not None else read_header(file_name)
+        self.keep = keep
+        self.first = first
+        self.last = last
+
+    def describe(self):
+        cols = self.columns()
+        text = f"scan {self.file_name} [{len(cols)} of {len(self.header)} columns]"
+        return text + _year_range(self.first, self.last)
+
+    def columns(self):
+        if self.keep is None:
+            return list(self.header)
+        return [col for col in self.header if col in self.keep]
+
+    def run(self, frames):
+        return read_columns(self.file_name, self.columns(), self.header,
+                            min_year=self.first, max_year=self.last)
+
+
+class Select(Node):
+    label = 'select'
+
+    def __init__(self, child, names):
+        super().__init__(child)
+        self.names = list(names)
+
+    def describe(self):
+        return f"select {self.names}"
+
+    def columns(self):
+        return list(self.names)
+
+    def run(self, frames):
+        return frames[0][self.names]
+
+
+class Years(Node):
+    label = 'years'
+
+    def __init__(self, child, first=None, last=None):
+        super().__init__(child)
+        self.first = first
+        self.last = last
+
+    def describe(self):
+        return 'filter' + _year_range(self.first, self.last)
+
+    def columns(self):
+        return self.inputs[0].columns()
+
+    def run(self, frames):
+        df = frames[0]
+        years = df.index.get_level_values('year') if 'year' in df.index.names else df['year']
+        keep = np.ones(len(df), dtype=bool)
+        if self.first is not None:
+            keep &= years >= self.first
+        if self.last is not None:
+            keep &= years <= self.last
+        return df[keep]
+
+
+class Join(Node):
+    label = 'join'
+
+    def describe(self):
+        return f"outer join {len(self.inputs)} inputs on {PANEL_INDEX}"
+
+    def columns(self):
+        names = list(PANEL_INDEX)
+        for node in self.inputs:
+            names += [col for col in node.columns() if col not in names]
+        return names
+
+    def run(self, frames):
+        return outer_join(frames, keys=PANEL_INDEX)
+
+
+class Snapshot(Node):
+    label = 'snapshot'
+
+    def __init__(self, child, names=None, as_of=None, max_age=None):
+        super().__init__(child)
+        self.names = names
+        self.as_of = as_of
+        self.max_age = max_age
+
+    def describe(self):
+        options = [f"{key}={value}" for key, value in
+                   [('columns', self.names), ('as_of', self.as_of), ('max_age', self.max_age)]
+                   if value is not None]
+        return ' '.join(['latest'] + options)
+
+    def columns(self):
+        names = self.names if self.names is not None else self.inputs[0].columns()
+        return list(PANEL_INDEX) + [col for col in names if col not in PANEL_INDEX]
+
+    def run(self, frames):
+        return latest(frames[0], self.names, as_of=self.as_of, max_age=self.max_age)
+
+
+class Validate(Node):
+    label = 'validate'
+
+    def __init__(self, child, schema, report, source):
+        super().__init__(child)
+        self.schema = schema
+        self.report = report
+        self.source = source
+
+    def describe(self):
+        return f"validate {self.source}"
+
+    def columns(self):
+        return self.inputs[0].columns()
+
+    def run(self, frames):
+        return self.report.check(frames[0], self.schema, self.source)
+
+
+def _schema_columns(schema):
+    columns = list(schema.get('keys', [])) + list(schema.get('ranges', {})) + list(schema.get('coverage', {}))
+    if schema.get('countries'):
+        columns.append(schema['countries'])
+    return columns
+
+
+def _year_range(first, last):
+    if first is None and last is None:
+        return ''
+    return f" year {'' if first is None else first}..{'' if last is None else last}"
+
+
+def _bound(current, new, pick):
+    return new if current is None else current if new is None else pick(current, new)
+
+
+def optimize(node, needed=None, first=None, last=None):
+    """
+    Copy of the plan under node with the year range (first, last) and the
+    needed output columns (None for all) pushed down into the scans.
+    Year filters move below joins and selections, since the join keys carry
+    the year; they stay above a snapshot, whose year is each country's latest.
+    """
+    if isinstance(node, Scan):
+        keep = None if needed is None else set(needed) | set(BASE_COLS)
+        if node.keep is not None:
+            keep = node.keep if keep is None else keep & node.keep
+        return Scan(node.file_name, node.header, keep,
+                    _bound(node.first, first, max), _bound(node.last, last, min))
+
+    if isinstance(node, Select):
+        names = node.names if needed is None else [col for col in node.names if col in needed]
+        return Select(optimize(node.inputs[0], names, first, last), names)
+
+    if isinstance(node, Years):
+        return optimize(node.inputs[0], needed,
+                        _bound(first, node.first, max), _bound(last, node.last, min))
+
+    if isinstance(node, Join):
+        return Join(*[optimize(child, _with_keys(needed), first, last) for child in node.inputs])
+
+    if isinstance(node, Validate):
+        # The checked columns are read even when nothing later uses them
+        checked = None if needed is None else list(needed) + _schema_columns(node.schema)
+        return Validate(optimize(node.inputs[0], checked, first, last), node.schema, node.report, node.source)
+
+    if isinstance(node, Snapshot):
+        names = node.names
+        if needed is not None:
+            names = [col for col in (names or node.inputs[0].columns()) if col in needed and col not in PANEL_INDEX]
+        # latest ignores rows after as_of, so they need not be read
+        below = Snapshot(optimize(node.inputs[0], _with_keys(names), None, node.as_of),
+                         names, node.as_of, node.max_age)
+        return below if first is None and last is None else Years(below, first, last)
+
+    raise TypeError(f"Unknown plan node {node!r}")
+
+
+def _with_keys(names):
+    return None if names is None else list(PANEL_INDEX) + [col for col in names if col not in PANEL_INDEX]
+
+
+class LazyFrame:
+    def __init__(self, node):
+        self.node = node
+        self._plan = None
+
+    def select(self, *names):
+        """Keep only these columns, in this order (list the keys to keep them)."""
+        return LazyFrame(Select(self.node, names))
+
+    def years(self, first=None, last=None):
+        """Keep rows with first <= year <= last."""
+        return LazyFrame(Years(self.node, first, last))
+
+    def validate(self, schema, report, source=None):
+        """Run validate.check on the rows as they pass, recording violations in report."""
+        return LazyFrame(Validate(self.node, schema, report, source or _source(self.node)))
+
+    def snapshot(self, columns=None, as_of=None, max_age=None):
+        """Most recent value per country, as panel.latest."""
+        return LazyFrame(Snapshot(self.node, columns, as_of, max_age))
+
+    def plan(self):
+        if self._plan is None:
+            self._plan = optimize(self.node)
+        return self._plan
+
+    def collect(self):
+        """Run the optimized plan and return its frame."""
+        return self.plan().execute()
+
+    def explain(self):
+        """The optimized plan, one step per line, with rows and time once collected."""
+        lines = []
+
+        def walk(node, depth):
+            text = '  ' * depth + node.describe()
+            if node.rows is not None:
+                text += f"  -> {node.rows} rows, {node.seconds:.3f}s"
+            lines.append(text)
+            for child in node.inputs:
+                walk(child, depth + 1)
+
+        walk(self.plan(), 0)
+        return '\n'.join(lines)
+
+
+def _source(node):
+    """File name of the first scan under node."""
+    return node.file_name if isinstance(node, Scan) else _source(node.inputs[0])
+
+
+def scan(file_name, header=None):
+    """A lazy frame over one topic file (header as from ingest.read_header)."""
+    return LazyFrame(Scan(file_name, header))
+
+
+def join(*frames):
+    """Outer join of lazy frames on (country, year)."""
+    return LazyFrame(Join(*[frame.node for frame in frames]))
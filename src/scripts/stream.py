@@ -0,0 +1,224 @@
+"""
+Streaming mode for the topic merges. Each source is read in chunks with the
+year filter and column selection applied while reading, and its rows are
+spilled into partition files by a hash of the country code. A partition
+then holds every row of its countries, so the join and per-country steps
+(latest, ffill) run one partition at a time and peak memory is bounded by
+the largest partition rather than the whole panel.
+Set STREAM_PARTITIONS to a partition count to turn it on for the merge
+scripts (e.g. STREAM_PARTITIONS=16 python pipeline.py).
+
+The same country partitions let the per-country steps run in parallel: set
+STREAM_JOBS to a worker count and the merge scripts snapshot the partitions
+in a process pool, whether the panel is streamed or held in memory.
+"""
+
+import functools
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from ingest import BASE_COLS, KEY_DTYPES, VALUE_DTYPE, iter_columns
+from panel import PANEL_INDEX, latest, outer_join
+from profiling import profiled
+from validate import topic_schema
+
+PARTITIONS = int(os.environ.get('STREAM_PARTITIONS', '0') or 0)
+CHUNK_ROWS = int(os.environ.get('STREAM_CHUNK_ROWS', '100000'))
+JOBS = int(os.environ.get('STREAM_JOBS', '1') or 1)
+
+# Forked workers inherit the in-memory panel instead of unpickling a copy;
+# the calling scripts also run at import time, so spawning a worker would
+# re-import and re-run them
+MP_CONTEXT = (
+    multiprocessing.get_context('fork')
+    if 'fork' in multiprocessing.get_all_start_methods() else None
+)
+
+# The panel and its partition numbers, as seen by forked workers
+_panel = None
+_codes = None
+
+
+def partition_of(countries, partitions):
+    """Stable partition number of each country code."""
+    hashes = pd.util.hash_array(countries.astype(str).to_numpy(dtype=object), categorize=True)
+    return hashes % partitions
+
+
+@profiled('spill')
+def spill(sources, work_dir, partitions, min_year=None, chunksize=CHUNK_ROWS, report=None):
+    """
+    Write the selected columns of each source into per-partition CSVs under
+    work_dir. sources maps file name to (header, normalized columns).
+    Every source gets a file in every partition, empty ones with the header
+    only, so each partition joins to the same columns. With a validate
+    report, each source's chunks are checked against the topic_schema of
+    its indicators as they are read.
+    """
+    paths = {}
+    for i, (file_name, (header, columns)) in enumerate(sources.items()):
+        parts = [os.path.join(work_dir, f"{p:04d}-{i:02d}.csv") for p in range(partitions)]
+        for path in parts:
+            pd.DataFrame(columns=columns).to_csv(path, index=False)
+
+        chunks = iter_columns(file_name, columns, header, min_year=min_year, chunksize=chunksize)
+        if report is not None:
+            found = [col for col in columns if col not in BASE_COLS]
+            chunks = report.check_chunks(chunks, topic_schema(found), file_name)
+        for chunk in chunks:
+            for p, rows in chunk.groupby(partition_of(chunk['country'], partitions)):
+                rows.to_csv(parts[p], mode='a', header=False, index=False)
+        paths[file_name] = parts
+    return paths
+
+
+def _read_partition(paths, sources, p, value_cols):
+    frames = [
+        pd.read_csv(parts[p], dtype={col: KEY_DTYPES.get(col, VALUE_DTYPE) for col in columns})
+        for parts, (_, columns) in zip(paths.values(), sources.values())
+    ]
+    joined = outer_join([df for df in frames if len(df)], keys=PANEL_INDEX)
+    return None if joined is None else joined.reindex(columns=value_cols)
+
+
+def _value_cols(sources):
+    return [col for _, columns in sources.values() for col in columns if col not in BASE_COLS]
+
+
+def iter_panel(sources, partitions=None, min_year=None, chunksize=CHUNK_ROWS, work_dir=None, report=None):
+    """
+    Yield the outer join of sources on (country, year), one country
+    partition at a time, indexed and sorted like panel.outer_join. Partitions
+    without rows are skipped. Spill files go to a temporary directory (under
+    work_dir if given) that is removed once the partitions are consumed.
+    With report, the sources are checked as they are spilled.
+    """
+    partitions = partitions or PARTITIONS or 1
+    value_cols = _value_cols(sources)
+
+    with tempfile.TemporaryDirectory(prefix='panel-', dir=work_dir) as spill_dir:
+        paths = spill(sources, spill_dir, partitions, min_year=min_year, chunksize=chunksize, report=report)
+        for p in range(partitions):
+            joined = _read_partition(paths, sources, p, value_cols)
+            if joined is not None:
+                yield joined
+
+
+def _join_and_apply(func, paths, sources, p, value_cols):
+    joined = _read_partition(paths, sources, p, value_cols)
+    return None if joined is None else func(joined)
+
+
+def map_panel(sources, func, partitions=None, jobs=None, min_year=None, chunksize=CHUNK_ROWS, work_dir=None,
+              report=None):
+    """
+    Streamed func(partition) over the country partitions of iter_panel,
+    with each worker reading and joining its own partitions. func must be
+    importable (a module-level function). Returns the results of non-empty
+    partitions in partition order.
+    """
+    partitions = partitions or PARTITIONS or 1
+    jobs = jobs or JOBS
+    if jobs <= 1:
+        return [func(part) for part in iter_panel(sources, partitions, min_year, chunksize, work_dir, report)]
+
+    value_cols = _value_cols(sources)
+    with tempfile.TemporaryDirectory(prefix='panel-', dir=work_dir) as spill_dir:
+        paths = spill(sources, spill_dir, partitions, min_year=min_year, chunksize=chunksize, report=report)
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=MP_CONTEXT) as pool:
+            futures = [
+                pool.submit(_join_and_apply, func, paths, sources, p, value_cols)
+                for p in range(partitions)
+            ]
+            results = [future.result() for future in futures]
+    return [result for result in results if result is not None]
+
+
+def _apply_inherited(func, p):
+    return func(_panel[_codes == p])
+
+
+def map_partitions(panel, func, partitions=None, jobs=None, by='country'):
+    """
+    func(partition) over the country hash partitions of an in-memory panel
+    (indexed by (by, ...)), in a pool of jobs worker processes. Forked
+    workers select their partition from the inherited panel, so only the
+    results are pickled. Returns the results of non-empty partitions in
+    partition order.
+    """
+    global _panel, _codes
+    jobs = jobs or JOBS
+    partitions = partitions or PARTITIONS or jobs * 4
+    codes = partition_of(panel.index.get_level_values(by), partitions)
+    present = sorted(set(codes.tolist()))
+
+    if jobs <= 1:
+        return [func(panel[codes == p]) for p in present]
+
+    if MP_CONTEXT is None:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(func, panel[codes == p]) for p in present]
+            return [future.result() for future in futures]
+
+    _panel, _codes = panel, codes
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=MP_CONTEXT) as pool:
+            futures = [pool.submit(_apply_inherited, func, p) for p in present]
+            return [future.result() for future in futures]
+    finally:
+        _panel = _codes = None
+
+
+def _write_and_apply(func, work_dir, part):
+    fd, path = tempfile.mkstemp(suffix='.csv', dir=work_dir)
+    with os.fdopen(fd, 'w') as f:
+        part.reset_index().to_csv(f, index=False)
+    return path, func(part)
+
+
+def _concat_csv(paths, path):
+    """Write the CSVs at paths one after another to path, keeping the first header."""
+    with open(path, 'wb') as out:
+        for i, part_path in enumerate(paths):
+            with open(part_path, 'rb') as f:
+                if i:
+                    f.readline()
+                shutil.copyfileobj(f, out)
+
+
+def snapshot(panel, func=latest, min_year=None, panel_file=None, report=None):
+    """
+    func (panel.latest by default) over the country partitions of panel,
+    concatenated and sorted by country. panel is an in-memory panel, split
+    across JOBS worker processes when JOBS > 1, or the sources of a streamed
+    join (as for map_panel), read from min_year on. With panel_file, the
+    joined panel is also written there as CSV; a streamed panel is written
+    one partition after another, each sorted by country and year. Streamed
+    sources are checked into report as they are read. Returns None when
+    panel is None or has no rows.
+    """
+    if panel is None:
+        return None
+    if isinstance(panel, dict):
+        if panel_file is None:
+            results = map_panel(panel, func, min_year=min_year, report=report)
+        else:
+            # Workers write their partition of the panel next to the snapshot
+            with tempfile.TemporaryDirectory(prefix='panel-') as work_dir:
+                written = map_panel(panel, functools.partial(_write_and_apply, func, work_dir),
+                                    min_year=min_year, report=report)
+                if written:
+                    _concat_csv([path for path, _ in written], panel_file)
+            results = [result for _, result in written]
+    else:
+        if panel_file is not None:
+            panel.reset_index().to_csv(panel_file, index=False)
+        if JOBS <= 1:
+            return func(panel)
+        results = map_partitions(panel, func)
+    return pd.concat(results).sort_values('country', ignore_index=True) if results else None
@@ -0,0 +1,79 @@
+"""
+Content-addressed on-disk cache of parsed topic CSVs.
+Each source file is parsed once and stored as an uncompressed Feather file
+named after the hash of the CSV bytes, so reads are memory-mapped and an
+edited CSV simply misses the cache. Requires pyarrow; without it every
+lookup misses and callers fall back to parsing the CSV.
+"""
+
+import contextlib
+import os
+
+try:
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+from artifacts import atomic_write, digest
+
+CACHE_DIR = os.environ.get('TOPIC_CACHE_DIR', '.topic_cache')
+
+# Part of every entry's file name: tables written by an older parse_topic
+# (e.g. before text values went through to_number) simply miss
+CACHE_VERSION = 2
+
+def entry_path(file_name, sha256):
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    return os.path.join(CACHE_DIR, f"{stem}-{sha256[:16]}-v{CACHE_VERSION}.feather")
+
+
+def _drop_stale(file_name, keep):
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        if name.startswith(f"{stem}-") and name.endswith('.feather') and path != keep:
+            # Stages running side by side may evict the same entry
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+
+def cached(file_name, columns=None, parse=None):
+    """
+    The memory-mapped table cached for the current content of file_name,
+    restricted to columns. On a miss, parse(file_name) builds the DataFrame
+    to cache; without parse, or when the cache is unavailable, returns None.
+    """
+    if feather is None:
+        return None
+
+    path = entry_path(file_name, digest(file_name))
+    if not os.path.exists(path):
+        if parse is None:
+            return None
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df = parse(file_name)
+        with atomic_write(path, 'wb') as f:
+            feather.write_feather(df, f, compression='uncompressed')
+        _drop_stale(file_name, keep=path)
+    return feather.read_table(path, columns=columns, memory_map=True)
+
+
+def load(file_name, parse, columns=None, years=None):
+    """
+    Return the cached table for file_name, restricted to columns and, when
+    years is a (first, last) pair (either may be None), to rows in that
+    year range. Rows are filtered before conversion to pandas.
+    parse(file_name) builds the DataFrame on a miss. Returns None when the
+    cache is unavailable.
+    """
+    table = cached(file_name, columns, parse)
+    if table is None:
+        return None
+    if years is not None:
+        first, last = years
+        if first is not None:
+            table = table.filter(pc.greater_equal(table['year'], first))
+        if last is not None:
+            table = table.filter(pc.less_equal(table['year'], last))
+    return table.to_pandas()
@@ -0,0 +1,85 @@
+"""
+Clustering of whole country panels instead of single cross-sections.
+The standardized country-year rows are laid out as a country x year x
+feature tensor. Per-year labels come from one MiniBatchKMeans fit over all
+country-years, so a country's label in any year is comparable with every
+other year and cluster migration can be read off directly. Trajectory
+labels cluster each country's flattened path through the years, with gaps
+filled from the nearest observed year.
+"""
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+
+def tensor(countries, years, X):
+    """
+    Lay out rows of X keyed by (country, year) as a tensor.
+    Returns (country labels, year labels, tensor) where the tensor is
+    countries x years x features with NaN for country-years without a row.
+    """
+    country_labels, rows = np.unique(np.asarray(countries), return_inverse=True)
+    year_labels, cols = np.unique(np.asarray(years), return_inverse=True)
+    X = np.asarray(X)
+    T = np.full((len(country_labels), len(year_labels), X.shape[1]), np.nan, dtype=X.dtype)
+    T[rows, cols] = X
+    return country_labels, year_labels, T
+
+
+def fill_gaps(T):
+    """
+    T with each missing country-year taken from the country's previous
+    observed year, or its next one before the first observation.
+    Countries with no observed year stay NaN.
+    """
+    observed = ~np.isnan(T).any(axis=2)
+    n_years = T.shape[1]
+    steps = np.arange(n_years)
+    previous = np.maximum.accumulate(np.where(observed, steps, -1), axis=1)
+    following = np.minimum.accumulate(np.where(observed, steps, n_years)[:, ::-1], axis=1)[:, ::-1]
+    source = np.where(previous >= 0, previous, np.minimum(following, n_years - 1))
+    return np.take_along_axis(T, source[:, :, None], axis=1)
+
+
+def fit(X, k, random_state=42, batch_size=1024):
+    """A MiniBatchKMeans fitted to the rows of X."""
+    kmeans = MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3, batch_size=batch_size)
+    kmeans.fit(X)
+    return kmeans
+
+
+def yearly_labels(kmeans, T):
+    """Labels of every country-year in T (-1 where there is no row), countries x years."""
+    observed = ~np.isnan(T).any(axis=2)
+    labels = np.full(observed.shape, -1)
+    labels[observed] = kmeans.predict(T[observed])
+    return labels
+
+
+def trajectory_labels(T, k, min_years=5, random_state=42):
+    """
+    Cluster countries by their whole path through the years.
+    Only countries observed in at least min_years years are clustered; the
+    others get -1. Returns (labels, kmeans).
+    """
+    observed = ~np.isnan(T).any(axis=2)
+    eligible = observed.sum(axis=1) >= min_years
+    labels = np.full(len(T), -1)
+    if eligible.sum() < k:
+        return labels, None
+    paths = fill_gaps(T[eligible]).reshape(int(eligible.sum()), -1)
+    kmeans = fit(paths, k, random_state=random_state)
+    labels[eligible] = kmeans.labels_
+    return labels, kmeans
+
+
+def transitions(labels, k):
+    """
+    k x k counts of year-to-year label changes, from row to column, over
+    consecutive years where the country has a row in both.
+    """
+    before, after = labels[:, :-1], labels[:, 1:]
+    both = (before >= 0) & (after >= 0)
+    counts = np.zeros((k, k), dtype=int)
+    np.add.at(counts, (before[both], after[both]), 1)
+    return counts
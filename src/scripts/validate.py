@@ -0,0 +1,282 @@
+"""
+Data-quality checks for the tables the stage scripts load and merge.
+A schema declares what a table must satisfy:
+
+    {
+        'keys': ['country', 'year'],     # unique key columns (or index levels)
+        'countries': 'country',          # ISO3 codes checked against country_meta.csv
+        'ranges': {column: (low, high)}, # inclusive bounds, None for open; missing values pass
+        'coverage': {column: share}      # least share of rows with a value
+    }
+
+A table read in chunks (the streamed joins) is checked with
+Report.check_chunks as the chunks pass.
+
+The checks are column operations on frames a script already holds (the
+query planner runs them on each scan as it is read), so they add no extra
+passes over the data. Violations collect in a Report, which a script
+finishes before doing further work: the report is written as JSON to
+quality/<script>.json, and with DATA_CHECKS=error (the default) any error
+makes the script exit non-zero, so the pipeline stops before downstream
+stages. DATA_CHECKS=warn only reports; DATA_CHECKS=off skips the checks.
+"""
+
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+import countries
+from artifacts import atomic_write
+from ingest import normalize_column
+
+CHECKS_MODE = os.environ.get('DATA_CHECKS', 'error')
+REPORT_DIR = 'quality'
+
+# Topic files also carry World Bank aggregates (regions, income groups),
+# which are not countries; more unknown codes than this share is an error
+MAX_UNKNOWN_SHARE = 0.5
+
+# Examples kept per violation in the report
+EXAMPLES = 5
+
+PERCENT = (0, 100)
+NON_NEGATIVE = (0, None)
+
+# Known bounds of the indicators the scripts use, by normalized name.
+# Gross ratios (enrollment, completion rates) and % of GDP can exceed 100.
+RANGES = {
+    'literacy rate, adult total (% of people ages 15 and above)': PERCENT,
+    'individuals using the internet (% of population)': PERCENT,
+    'rural population (% of total population)': PERCENT,
+    'renewable energy consumption (% of total final energy consumption)': PERCENT,
+    'poverty headcount ratio at $6.85 a day (2017 ppp) (% of population)': PERCENT,
+    'access to electricity (% of population)': PERCENT,
+    'access to electricity, rural (% of rural population)': PERCENT,
+    'life expectancy at birth, total (years)': (0, 120),
+    'gdp per capita (current us$)': NON_NEGATIVE,
+    'gdp (current us$)': NON_NEGATIVE,
+    'electric power consumption (kwh per capita)': NON_NEGATIVE,
+    'mobile cellular subscriptions (per 100 people)': NON_NEGATIVE,
+    'school enrollment, secondary (% gross)': NON_NEGATIVE,
+    'primary completion rate, total (% of relevant age group)': NON_NEGATIVE,
+    'total greenhouse gas emissions excluding lulucf per capita (t co2e/capita)': NON_NEGATIVE,
+    'carbon intensity of gdp (kg co2e per 2021 ppp $ of gdp)': NON_NEGATIVE,
+    'pm2.5 air pollution, mean annual exposure (micrograms per cubic meter)': NON_NEGATIVE,
+    'energy use (kg of oil equivalent) per $1,000 gdp (constant 2021 ppp)': NON_NEGATIVE
+}
+
+# Least share of rows each indicator must fill, by normalized name: about
+# half its fill in the real files over the years the scripts read (2010 on
+# for the snapshots, 1990 on for the gap series), so a renamed or emptied
+# indicator fails while survey gaps (e.g. literacy at ~30%) pass
+COVERAGE = {
+    'literacy rate, adult total (% of people ages 15 and above)': 0.1,
+    'individuals using the internet (% of population)': 0.3,
+    'rural population (% of total population)': 0.5,
+    'renewable energy consumption (% of total final energy consumption)': 0.35,
+    'poverty headcount ratio at $6.85 a day (2017 ppp) (% of population)': 0.5,
+    'access to electricity (% of population)': 0.4,
+    'access to electricity, rural (% of rural population)': 0.4,
+    'gdp per capita (current us$)': 0.5,
+    'gdp (current us$)': 0.5,
+    'inflation, consumer prices (annual %)': 0.4,
+    'domestic credit to private sector (% of gdp)': 0.35,
+    'population growth (annual %)': 0.5,
+    'electric power consumption (kwh per capita)': 0.3,
+    'mobile cellular subscriptions (per 100 people)': 0.4,
+    'school enrollment, secondary (% gross)': 0.35,
+    'primary completion rate, total (% of relevant age group)': 0.3,
+    'total greenhouse gas emissions excluding lulucf per capita (t co2e/capita)': 0.4,
+    'carbon intensity of gdp (kg co2e per 2021 ppp $ of gdp)': 0.2,
+    'pm2.5 air pollution, mean annual exposure (micrograms per cubic meter)': 0.2,
+    'energy use (kg of oil equivalent) per $1,000 gdp (constant 2021 ppp)': 0.3
+}
+
+
+def topic_schema(columns, coverage=None, keys=('country', 'year'), countries='country'):
+    """
+    Schema for a table of topic indicators: unique keys, ISO3 country
+    codes, and the RANGES and COVERAGE of the given columns (coverage
+    overrides the latter).
+    """
+    if coverage is None:
+        coverage = {col: COVERAGE[normalize_column(col)] for col in columns if normalize_column(col) in COVERAGE}
+    return {
+        'keys': list(keys),
+        'countries': countries,
+        'ranges': {col: RANGES[normalize_column(col)] for col in columns if normalize_column(col) in RANGES},
+        'coverage': dict(coverage)
+    }
+
+
+def _keys_of(df, keys):
+    """The key columns of df, whether they are columns or index levels."""
+    return pd.DataFrame({
+        key: df.index.get_level_values(key) if key in df.index.names else df[key]
+        for key in keys
+    })
+
+
+def _examples(df, mask, keys, column=None):
+    rows = _keys_of(df[mask].head(EXAMPLES), [k for k in keys if k in df.columns or k in df.index.names])
+    if column is not None:
+        rows[column] = df.loc[mask, column].head(EXAMPLES).to_numpy()
+    return json.loads(rows.astype(object).to_json(orient='records'))
+
+
+def _violation(source, check, severity, count, rows, column=None, examples=None, **details):
+    record = {'source': source, 'check': check, 'severity': severity, 'column': column,
+              'count': int(count), 'rows': int(rows)}
+    record.update(details)
+    record['examples'] = examples or []
+    return record
+
+
+def _coverage_violations(source, coverage, rows, filled):
+    """Coverage violations from the non-null count of each column (None when it is missing)."""
+    violations = []
+    for col, least in coverage.items():
+        share = filled[col] / rows if filled[col] is not None and rows else 0.0
+        if share < least:
+            violations.append(_violation(source, 'coverage', 'error', rows - (filled[col] or 0), rows,
+                                         column=col, share=round(share, 4), least=least,
+                                         missing_column=filled[col] is None))
+    return violations
+
+
+def _merge(into, violation):
+    """Add a chunk's violation to the same check's record from earlier chunks."""
+    into['count'] += violation['count']
+    into['examples'] = (into['examples'] + violation['examples'])[:EXAMPLES]
+    if 'codes' in violation:
+        into['codes'] = sorted(set(into['codes']) | set(violation['codes']))[:50]
+
+
+def check(df, schema, source):
+    """Violations of schema in df, as report records."""
+    violations = []
+    rows = len(df)
+    keys = schema.get('keys', [])
+    present = [k for k in keys if k in df.columns or k in df.index.names]
+
+    if keys and present == keys:
+        dup = _keys_of(df, keys).duplicated(keep=False).to_numpy()
+        if dup.any():
+            violations.append(_violation(source, 'unique_keys', 'error', dup.sum(), rows,
+                                         examples=_examples(df, dup, keys), keys=keys))
+
+    col = schema.get('countries')
+    if col and (col in df.columns or col in df.index.names):
+        codes = _keys_of(df, [col])[col]
+        unknown = countries.keys(codes) == countries.UNKNOWN
+        if unknown.any():
+            share = unknown.mean()
+            violations.append(_violation(
+                source, 'known_countries', 'error' if share > MAX_UNKNOWN_SHARE else 'warning',
+                unknown.sum(), rows, column=col, share=round(float(share), 4),
+                codes=sorted(pd.unique(codes[unknown].astype(str)).tolist())[:50]
+            ))
+
+    for col, (low, high) in schema.get('ranges', {}).items():
+        if col not in df.columns:
+            continue
+        values = pd.to_numeric(df[col], errors='coerce')
+        bad = pd.Series(False, index=df.index)
+        if low is not None:
+            bad |= values < low
+        if high is not None:
+            bad |= values > high
+        bad = bad.to_numpy()
+        if bad.any():
+            violations.append(_violation(source, 'range', 'error', bad.sum(), rows, column=col,
+                                         low=low, high=high, examples=_examples(df, bad, present, col)))
+
+    coverage = schema.get('coverage', {})
+    filled = {col: int(df[col].notna().sum()) if col in df.columns else None for col in coverage}
+    violations.extend(_coverage_violations(source, coverage, rows, filled))
+    return violations
+
+
+class Report:
+    def __init__(self, script=None):
+        self.script = script or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+        self.checked = []
+        self.violations = []
+
+    def check(self, df, schema, source):
+        """Run the checks on df and return it unchanged."""
+        if CHECKS_MODE != 'off':
+            self.checked.append({'source': source, 'rows': len(df)})
+            self.violations.extend(check(df, schema, source))
+        return df
+
+    def check_chunks(self, chunks, schema, source):
+        """
+        Run the checks on a table read in chunks, yielding the chunks
+        unchanged. Coverage and the share of unknown countries are measured
+        over all chunks; keys are only checked within each chunk.
+        """
+        if CHECKS_MODE == 'off':
+            yield from chunks
+            return
+        per_chunk = {key: value for key, value in schema.items() if key != 'coverage'}
+        coverage = schema.get('coverage', {})
+        filled = dict.fromkeys(coverage)
+        merged = {}
+        rows = 0
+        for chunk in chunks:
+            rows += len(chunk)
+            for col in coverage:
+                if col in chunk.columns:
+                    filled[col] = (filled[col] or 0) + int(chunk[col].notna().sum())
+            for violation in check(chunk, per_chunk, source):
+                key = (violation['check'], violation['column'])
+                if key in merged:
+                    _merge(merged[key], violation)
+                else:
+                    merged[key] = violation
+            yield chunk
+
+        for violation in merged.values():
+            violation['rows'] = rows
+            if violation['check'] == 'known_countries':
+                share = violation['count'] / rows
+                violation['share'] = round(share, 4)
+                violation['severity'] = 'error' if share > MAX_UNKNOWN_SHARE else 'warning'
+        self.checked.append({'source': source, 'rows': rows})
+        self.violations.extend(merged.values())
+        self.violations.extend(_coverage_violations(source, coverage, rows, filled))
+
+    @property
+    def errors(self):
+        return [v for v in self.violations if v['severity'] == 'error']
+
+    def write(self, path=None):
+        path = path or os.path.join(REPORT_DIR, f"{self.script}.json")
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with atomic_write(path) as f:
+            json.dump({
+                'script': self.script,
+                'time': time.time(),
+                'errors': len(self.errors),
+                'warnings': len(self.violations) - len(self.errors),
+                'checked': self.checked,
+                'violations': self.violations
+            }, f, indent=2)
+        return path
+
+    def finish(self):
+        """Write the report, print its violations and exit on errors (unless DATA_CHECKS=warn)."""
+        if CHECKS_MODE == 'off':
+            return
+        path = self.write()
+        for v in self.violations:
+            where = f"{v['source']}" + (f" [{v['column']}]" if v['column'] else '')
+            print(f"[Validation {v['severity']}] {v['check']} in {where}: {v['count']} of {v['rows']} rows")
+        print(f"[Validation] {len(self.errors)} errors, {len(self.violations) - len(self.errors)} warnings "
+              f"in {len(self.checked)} tables; report saved to {path}")
+        if self.errors and CHECKS_MODE == 'error':
+            sys.exit(f"[ERROR] Data validation failed; see {path}")
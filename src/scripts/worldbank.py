@@ -0,0 +1,166 @@
+"""
+Concurrent client for the World Bank API (https://api.worldbank.org/v2).
+Requests share one pooled HTTP session and run on worker threads under a
+concurrency limit, failed requests are retried with exponential backoff,
+and responses carrying an ETag or Last-Modified header are cached on disk
+and revalidated, so unchanged pages are not downloaded again.
+Set WORLD_BANK_API to point the client at another server (e.g. a local
+stand-in for testing).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from urllib.parse import urlencode
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from artifacts import atomic_write
+from topic_cache import CACHE_DIR
+
+API_URL = os.environ.get('WORLD_BANK_API', 'https://api.worldbank.org/v2')
+HTTP_CACHE_DIR = os.path.join(CACHE_DIR, 'http')
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# World Bank topic IDs of the topic CSVs in src/data
+TOPICS = {
+    'agriculture_rural_development.csv': 1,
+    'aid_effectiveness.csv': 2,
+    'economy_growth.csv': 3,
+    'education.csv': 4,
+    'environment.csv': 6,
+    'financial_sector.csv': 7,
+    'infrastructure.csv': 9,
+    'poverty.csv': 11,
+    'private_sector.csv': 12,
+    'climate_change.csv': 19,
+    'external_debt.csv': 20
+}
+
+
+class Fetcher:
+    def __init__(self, base_url=API_URL, concurrency=8, retries=4, backoff=0.5,
+                 timeout=30, cache_dir=HTTP_CACHE_DIR):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._limit = None
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+    def _get(self, url):
+        """Blocking GET with revalidation and retries; returns the decoded JSON body."""
+        cache_path = self._cache_path(url)
+        cached = None
+        headers = {}
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        for attempt in range(self.retries + 1):
+            try:
+                resp = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            if resp.status_code in RETRY_STATUS and attempt < self.retries:
+                retry_after = resp.headers.get('Retry-After', '')
+                delay = float(retry_after) if retry_after.isdigit() else self.backoff * 2 ** attempt
+                time.sleep(delay)
+                continue
+            break
+
+        if resp.status_code == 304 and cached is not None:
+            return json.loads(cached['body'])
+        resp.raise_for_status()
+
+        etag = resp.headers.get('ETag')
+        last_modified = resp.headers.get('Last-Modified')
+        if etag or last_modified:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with atomic_write(cache_path) as f:
+                json.dump({'url': url, 'etag': etag, 'last_modified': last_modified, 'body': resp.text}, f)
+        return resp.json()
+
+    async def get(self, path, **params):
+        """GET base_url/path with format=json and params."""
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.concurrency)
+        query = urlencode(sorted({'format': 'json', **params}.items()))
+        url = f"{self.base_url}/{path.lstrip('/')}?{query}"
+        async with self._limit:
+            return await asyncio.to_thread(self._get, url)
+
+    async def get_all_pages(self, path, per_page=1000, **params):
+        """Records from every page of a paged endpoint; pages after the first are fetched concurrently."""
+        first = await self.get(path, per_page=per_page, page=1, **params)
+        if len(first) < 2 or first[1] is None:
+            return []
+
+        pages = int(first[0].get('pages', 1))
+        rest = await asyncio.gather(*(
+            self.get(path, per_page=per_page, page=page, **params)
+            for page in range(2, pages + 1)
+        ))
+        records = list(first[1])
+        for body in rest:
+            if len(body) >= 2 and body[1]:
+                records.extend(body[1])
+        return records
+
+
+async def fetch_countries(fetcher):
+    return await fetcher.get_all_pages('country', per_page=300)
+
+
+async def fetch_topic(fetcher, topic_id, date='1960:2024'):
+    """
+    Every indicator of a World Bank topic as a year/country/indicator table,
+    in the layout of the topic CSVs (ISO3 country codes, one column per
+    indicator name).
+    """
+    indicators = await fetcher.get_all_pages(f'topic/{topic_id}/indicator')
+    series = await asyncio.gather(*(
+        fetcher.get_all_pages(f"country/all/indicator/{ind['id']}", per_page=20000, date=date)
+        for ind in indicators
+    ))
+
+    records = [
+        (int(rec['date']), rec['countryiso3code'], rec['indicator']['value'], rec['value'])
+        for recs in series for rec in recs
+        if rec.get('countryiso3code') and rec.get('value') is not None and rec['date'].isdigit()
+    ]
+    df = pd.DataFrame(records, columns=['year', 'country', 'indicator', 'value'])
+    wide = df.pivot_table(index=['year', 'country'], columns='indicator', values='value', aggfunc='first')
+
+    names = [ind['name'] for ind in indicators if ind['name'] in wide.columns]
+    return wide[names].reset_index().rename_axis(columns=None)